@@ -1,6 +1,6 @@
 from base import *
 from scipy import optimize
-import itertools
+import itertools, time
 import lpCompiler
 
 def loopxs(x, l, loopName):
@@ -10,6 +10,56 @@ def updateFromGrids(db, grids, loop, l):
     [db.addOrMerge(g.name, loopxs(g, l, loop.name), priority='second')
      for g in grids]
 
+class meritOrderBackend:
+	""" Solves LPs where every variable enters exactly one equality constraint and there are no inequality constraints (e.g. hourly economic 
+		dispatch), by clearing each constraint in merit order: Variables are sorted on their unit cost c/a of the right-hand side, and the residual 
+		(right-hand side net of the variables at their lower bounds) is filled from the cheapest variable. The dual of the constraint is the unit 
+		cost of the marginal variable (if the residual is exactly filled by a variable, this variable is marginal; the dual is not unique in this 
+		case). Other LPs are solved by optimize.linprog(method = fallback). Called with the same arguments as 
+		optimize.linprog and returns a solution in the same format. """
+	def __init__(self, fallback = 'highs', tol = 1e-9):
+		self.fallback, self.tol = fallback, tol
+
+	def __call__(self, c = None, A_ub = None, b_ub = None, A_eq = None, b_eq = None, bounds = None, options = None, **kwargs):
+		A = None if A_eq is None else sparse.csc_matrix(A_eq, copy = True)
+		if A is not None:
+			A.sum_duplicates()
+			A.eliminate_zeros()
+		bounds = np.asarray(bounds, dtype = np.float64)
+		l, u = np.where(np.isnan(bounds[:,0]), -np.inf, bounds[:,0]), np.where(np.isnan(bounds[:,1]), np.inf, bounds[:,1])
+		if not self.applies(A, A_ub, l, u):
+			return optimize.linprog(method = self.fallback, c = c, A_ub = A_ub, b_ub = b_ub, A_eq = A_eq, b_eq = b_eq, bounds = bounds, options = options, **kwargs)
+		t = time.perf_counter()
+		sol = self.clear(np.asarray(c, dtype = np.float64), A, np.asarray(b_eq, dtype = np.float64), l, u)
+		sol['time'] = time.perf_counter()-t
+		return sol
+
+	@staticmethod
+	def applies(A, A_ub, l, u):
+		return (A is not None and (A_ub is None or A_ub.shape[0] == 0) and (np.diff(A.indptr) == 1).all() and np.isfinite(l).all() and np.isfinite(u).all())
+
+	def clear(self, c, A, b, l, u):
+		rows, a = A.indices, A.data
+		p, ylo, cap = c/a, np.minimum(a*l, a*u), np.abs(a*(u-l))
+		residual = b-np.bincount(rows, weights = ylo, minlength = A.shape[0])
+		tol = self.tol*max(1, np.abs(b).max(initial = 0))
+		order = np.lexsort((p, rows))
+		total = np.bincount(rows, weights = cap, minlength = A.shape[0])
+		before = np.cumsum(cap[order])-cap[order]-np.repeat(np.cumsum(total)-total, np.bincount(rows, minlength = A.shape[0]))
+		fill = np.empty(len(c))
+		fill[order] = np.clip(residual[rows[order]]-before, 0, cap[order])
+		x = np.where(a>0, l, u)+fill/a
+		marginal = order[before+cap[order] >= residual[rows[order]]-tol]
+		rowsMarginal, first = np.unique(rows[marginal], return_index = True)
+		λ = np.zeros(A.shape[0])
+		λ[rowsMarginal] = p[marginal[first]]
+		d = c-a*λ[rows]
+		feasible = ((residual >= -tol) & (residual <= total+tol)).all()
+		return optimize.OptimizeResult({'x': x, 'fun': c @ x, 'nit': 0, 'status': 0 if feasible else 2, 'success': feasible, 
+										'message': 'Cleared in merit order' if feasible else 'The problem is infeasible',
+										'eqlin': {'marginals': λ, 'residual': np.zeros(A.shape[0])}, 'ineqlin': {'marginals': np.empty(0), 'residual': np.empty(0)},
+										'lower': {'marginals': np.where(d>0, d, 0)}, 'upper': {'marginals': np.where(d<0, d, 0)}})
+
 def readSolutionLoop(sol, loop, i, extract, db):
 	return pd.concat(sol[i:len(loop)*len(extract):len(extract)], axis=1).set_axis(loop, axis=1).stack() if isinstance(db[extract[i]], pd.Series) else pd.Series(sol[i:len(loop)*len(extract):len(extract)], index=loop)
 
@@ -20,6 +70,7 @@ class modelShell:
 		self.scalarDualAtUpper = True
 		self.computeDual = computeDual
 		self.blocks = noneInit(blocks, lpCompiler.lpBlock(**kwargs))
+		self.backend = meritOrderBackend() if method == 'meritOrder' else None
 		if hasattr(self, 'globalDomains'):
 			self.blocks.globalDomains = self.globalDomains
 
@@ -27,7 +78,8 @@ class modelShell:
 		[getattr(self, k)(**v) for k,v in noneInit(execute, dict.fromkeys(['preSolve','initBlocks','solve'], {})).items() if hasattr(self,k)];
 
 	def solve(self, printSol = True, solKwargs = None, solOptions=None, postKwargs = None, **kwargs):
-		sol = optimize.linprog(method = self.method, **self.blocks(execute = solKwargs), **noneInit(solOptions, {}))
+		args = self.blocks(execute = solKwargs)
+		sol = self.backend(**args, **noneInit(solOptions, {})) if self.backend else optimize.linprog(method = self.method, **args, **noneInit(solOptions, {}))
 		if printSol:
 			print(f"Solution status {sol['status']}: {sol['message']}")
 		self.postSolve(sol, **noneInit(postKwargs, {}))
@@ -4,6 +4,9 @@ from pyDbs import adj, adjMultiIndex, noneInit
 from six import string_types
 from scipy import sparse
 from functools import reduce
+import logging, sys, time, contextlib, cProfile, pstats, tracemalloc, functools, weakref
+
+logger = logging.getLogger(__name__) # opt-in diagnostics, e.g. logging.basicConfig(level = logging.DEBUG)
 
 def ifinInit(x,kwargs,FallBackVal):
 	return kwargs[x] if x in kwargs else FallBackVal
@@ -36,76 +39,304 @@ def fIndex(variableName, index, btype = 'v'):
 
 def fIndexVariable(variableName, v, btype = 'v'):
 	return v.set_axis(fIndex(variableName, pyDbs.getIndex(v), btype = btype)) if isinstance(v, pd.Series) else pd.Series(v, index = fIndex(variableName, None, btype=btype), dtype= np.float64)
-"""
-Changed this:
-def vIndexSeries(f,names):
-	return f.index.set_names(names) if len(names)==1 else pd.MultiIndex.from_tuples(f.index.values,names=names)
 
 def vIndexSeries(f, names):
-    print(f.index.values)  # Debug: Output the index values
-    if not all(isinstance(i, tuple) for i in f.index.values):
-        raise TypeError("Expected index values to be tuples.")
-    return (
-        f.index.set_names(names)
-        if len(names) == 1
-        else pd.MultiIndex.from_tuples(f.index.values, names=names)
-    )
+	return vIndex(f.index, names)
 
-def vIndexSeries(f, names):
-    if not all(isinstance(i, tuple) for i in f.index.values):
-        # Filter out problematic indices
-        valid_index = [i for i in f.index.values if isinstance(i, tuple) and not pd.isna(i)]
-        if len(valid_index) != len(f.index):
-            print(f"Filtered out invalid indices: {set(f.index.values) - set(valid_index)}")
-            f = f.loc[valid_index]  # Reindex the Series
-    return (
-        f.index.set_names(names)
-        if len(names) == 1
-        else pd.MultiIndex.from_tuples(f.index.values, names=names)
-    )
-
-"""
-def vIndexSeries(f, names):
-    if len(f.index.values) == 0:
-        print("Index values are empty; returning empty index.")
-        return pd.Index([], name=tuple(names) if isinstance(names, list) else names)
-    
-    print(f"Index values: {f.index.values}")
-    print(f"Names: {names}, Expected levels: {len(f.index.values[0]) if isinstance(f.index.values[0], tuple) else 1}")
-    
-    if isinstance(f.index.values[0], tuple):
-        if len(names) != len(f.index.values[0]):
-            print(f"Adjusting names to match levels. Current names: {names}")
-            names = names[:len(f.index.values[0])]
-        return pd.MultiIndex.from_tuples(f.index.values, names=names)
-    else:
-        if len(names) != 1:
-            print(f"Adjusting names: Expected 1 name, got {len(names)}")
-            names = names[:1]  # Trim to one name
-    return f.index.set_names(names)
-
-"""
-def vIndexVariable(f, variable, names):
-    print(f"x-values: {f.xs(variable).values}")
-    print(f"Index names: {names}")
-    print(f"Generated index: {vIndexSeries(f.xs(variable), names)}")
-    return pd.Series(f.xs(variable).values, index = vIndexSeries(f.xs(variable),names), dtype = np.float64) if names else f.xs(variable)[0]
-"""
-def vIndexVariable(f, variable, names):
-    values = f.xs(variable).values
-    index = vIndexSeries(f.xs(variable), names)
-    if len(values) != len(index):
-        # Handle mismatch: provide a fallback index
-        print(f"Mismatch: values length = {len(values)}, index length = {len(index)}")
-        #Provide hashable index name
-        index = pd.Index([None] * len(values), name=tuple(names) if isinstance(names, list) else names)
-    return pd.Series(values, index=index, dtype=np.float64)
+def vIndex(index, names):
+	""" Index with levels 'names' from index of tuples """
+	if index.empty:
+		return pd.MultiIndex.from_tuples([], names = names) if len(names)>1 else pd.Index([], name = names[0])
+	return index.set_names(names) if len(names)==1 else pd.MultiIndex.from_tuples(index.values, names=names)
 
+def vIndexVariable(f, variable, names):
+	x = f.xs(variable)
+	logger.debug("Unloading '%s': %d values over domains %s", variable, len(x), names)
+	return pd.Series(x.values, index = vIndexSeries(x, names), dtype = np.float64) if names else x.iloc[0]
 
 def vIndexSymbolDual(f, symbol, names):
 	keep = f.xs(symbol)
 	return keep.set_axis(pd.MultiIndex.from_frame(vIndexSeries(keep.droplevel('_type'), names).to_frame(index=False).assign(_type=keep.index.get_level_values('_type')))) if names else keep.droplevel('_sindex')
 
+def unloadSlice(x, index):
+	return pd.Series(x, index = index, dtype = np.float64) if index is not None else x[0]
+
+def dualSlice(ite, index, types):
+	""" Dual values (one array per type in types) with 'index' extended by the level '_type' """
+	return pd.Series(np.hstack(ite), index = typeIndex(index, types), dtype = np.float64)
+
+def typeIndex(index, types):
+	if index is None:
+		return pd.Index(types, name = '_type')
+	index = index if isinstance(index, pd.MultiIndex) else pd.MultiIndex.from_arrays([index])
+	return pd.MultiIndex(levels = list(index.levels)+[types], codes = [np.tile(c, len(types)) for c in index.codes]+[np.repeat(np.arange(len(types)), len(index))], names = list(index.names)+['_type'], verify_integrity = False)
+
+# INTEGER-CODED INDEX METHODS
+def nIndex(index):
+	""" Native counterpart of fIndex: Keep levels (sorted by name) instead of packing them into tuples """
+	return None if index is None else setattrReturn(reorderStd(index) if isinstance(index, pd.MultiIndex) else index.copy(), '_n', sorted(index.names))
+
+def nIndexVariable(v):
+	return v.set_axis(nIndex(v.index)) if isinstance(v, pd.Series) else v
+
+def nDomains(v, attr = '_n'):
+	return getattr(v.index, attr) if isinstance(v, pd.Series) else []
+
+def npValues(x):
+	return x.values if isinstance(x, (pd.Series, pd.Index)) else x
+
+def sameSymbol(x, y):
+	""" True if x and y have the same index and values """
+	if isinstance(x, pd.Series) and isinstance(y, pd.Series):
+		return list(x.index.names) == list(y.index.names) and x.index.equals(y.index) and np.array_equal(x.values.astype(np.float64), y.values.astype(np.float64), equal_nan = True)
+	return not isinstance(x, pd.Series) and not isinstance(y, pd.Series) and np.array_equal(np.float64(noneInit(x, np.nan)), np.float64(noneInit(y, np.nan)), equal_nan = True)
+
+def samePattern(x, y):
+	""" True if x and y are defined over the same index (or are both scalars) """
+	if isinstance(x, pd.Series) and isinstance(y, pd.Series):
+		return list(x.index.names) == list(y.index.names) and x.index.equals(y.index)
+	return x is not None and not isinstance(x, pd.Series) and not isinstance(y, pd.Series)
+
+def lenIndex(index):
+	return 1 if index is None else len(index)
+
+def offsetSlices(d):
+	""" Dictionary of contiguous slices from dictionary of lengths (in the order of d) """
+	stops = np.cumsum(list(d.values()), dtype = np.int64)
+	return {k: slice(int(stop-n), int(stop)) for (k,n), stop in zip(d.items(), stops)}
+
+def subIndex(index, levels):
+	""" Index restricted to 'levels' (in the given order) """
+	i = index.droplevel([n for n in index.names if n not in levels])
+	return i.reorder_levels(levels) if isinstance(i, pd.MultiIndex) else i
+
+def unionIndex(ite):
+	""" Sorted union of indices defined over the same levels; for MultiIndices this is done on level codes. """
+	if isinstance(ite[0], pd.MultiIndex):
+		i = ite[0].append(list(ite[1:])) if len(ite)>1 else ite[0]
+		i = i[~i.duplicated()]
+		return i._sort_levels_monotonic().sortlevel(list(range(i.nlevels)), sort_remaining=True)[0]
+	else:
+		return reduce(pd.Index.union, ite).unique().sort_values()
+
+def levelCodes(index, reference):
+	""" Codes of 'index' expressed in terms of the levels of 'reference' (-1 if a label is not in reference) """
+	return np.vstack([np.where(c>=0, reference.levels[i].get_indexer(index.levels[i])[c], -1) for i,c in enumerate(index.codes)])
+
+def codePositions(index, reference):
+	""" Integer positions of the elements of 'index' in 'reference' (-1 if not in reference). """
+	if not isinstance(reference, pd.MultiIndex) or reference.empty:
+		return reference.get_indexer(index)
+	index = index.reorder_levels(reference.names)
+	refCodes, codes = np.vstack(reference.codes), levelCodes(index, reference)
+	shape = tuple(len(l) for l in reference.levels)
+	if (refCodes<0).any() or np.prod(shape, dtype=float) >= np.iinfo(np.int64).max:
+		return reference.get_indexer(index)
+	valid = (codes>=0).all(axis=0)
+	refKeys, keys = np.ravel_multi_index(refCodes, shape), np.ravel_multi_index(np.where(valid, codes, 0), shape)
+	order = np.argsort(refKeys, kind = 'stable')
+	sortedKeys = refKeys[order]
+	loc = np.minimum(np.searchsorted(sortedKeys, keys), len(order)-1)
+	return np.where(valid & (sortedKeys[loc] == keys), order[loc], -1)
+
+def indexLevelCodes(index):
+	""" Levels and codes of an index (a simple index is factorized) """
+	if isinstance(index, pd.MultiIndex):
+		return list(index.levels), list(index.codes)
+	codes, uniques = pd.factorize(index)
+	return [uniques], [codes]
+
+def joinKeys(codes, sizes):
+	""" Integer key per row of the given level codes; keys are re-densified if the product of level sizes would overflow int64. """
+	key, size = np.zeros(len(codes[0]), dtype = np.int64), 1
+	for c,n in zip(codes, sizes):
+		if size*max(n,1) >= 2**62:
+			uniques, key = np.unique(key, return_inverse = True)
+			size = len(uniques)
+		key, size = key*max(n,1)+c, size*max(n,1)
+	return key
+
+def joinCodes(x, y):
+	""" Sort-merge join of the indices x and y on their common levels. Returns positions (ix, iy) of the matched pairs (ordered by ix) 
+		and the positions in x without a match in y. """
+	common = [n for n in x.names if n in y.names]
+	if not common:
+		return np.repeat(np.arange(len(x)), len(y)), np.tile(np.arange(len(y)), len(x)), np.empty(0, dtype = np.int64)
+	(xLevels, xCodes), (yLevels, yCodes) = indexLevelCodes(x), indexLevelCodes(y)
+	xCodes = [np.where(xCodes[x.names.index(n)]>=0, yLevels[y.names.index(n)].get_indexer(xLevels[x.names.index(n)])[xCodes[x.names.index(n)]], -1) for n in common]
+	yCodes = [yCodes[y.names.index(n)] for n in common]
+	xValid, yValid = np.all([c>=0 for c in xCodes], axis = 0), np.all([c>=0 for c in yCodes], axis = 0)
+	keys = joinKeys([np.hstack([np.where(xValid, cx, 0), np.where(yValid, cy, 0)]) for cx,cy in zip(xCodes, yCodes)], [len(yLevels[y.names.index(n)]) for n in common])
+	xKeys, yPos = keys[:len(x)], np.flatnonzero(yValid)
+	order = yPos[np.argsort(keys[len(x):][yPos], kind = 'stable')]
+	yKeys = keys[len(x):][order]
+	lo = np.searchsorted(yKeys, xKeys, side = 'left')
+	counts = np.where(xValid, np.searchsorted(yKeys, xKeys, side = 'right')-lo, 0)
+	ix = np.repeat(np.arange(len(x)), counts)
+	iy = order[np.repeat(lo, counts)+np.arange(len(ix))-np.repeat(np.cumsum(counts)-counts, counts)]
+	return ix, iy, np.flatnonzero(counts == 0)
+
+def bcJoin(x, y):
+	""" Integer-coded counterpart of adjMultiIndex.bc(x, y) for a series x and an index y: Only combinations of elements that match on the 
+		common levels are kept. Returns the broadcasted series, the position in y of each element, and the positions in x without a match in y. """
+	ix, iy, missing = joinCodes(x.index, y)
+	(xLevels, xCodes), (yLevels, yCodes) = indexLevelCodes(x.index), indexLevelCodes(y)
+	yOnly = [i for i,n in enumerate(y.names) if n not in x.index.names]
+	index = pd.MultiIndex(levels = xLevels+[yLevels[i] for i in yOnly], codes = [c[ix] for c in xCodes]+[yCodes[i][iy] for i in yOnly], 
+						  names = list(x.index.names)+[y.names[i] for i in yOnly], verify_integrity = False)
+	return pd.Series(x.values[ix], index = index if index.nlevels>1 else index.get_level_values(0)), iy, missing
+
+# INSTRUMENTATION
+class phaseLog:
+	""" Accumulates time spent in (possibly nested) named phases. With profile = True, a cProfile.Profile is collected per phase (excluding the 
+		time spent in nested phases); with trace = True, the peak memory traced by tracemalloc during each phase is recorded. """
+	def __init__(self, profile = False, trace = False):
+		self.profile, self.trace = profile, trace
+		self.reset()
+
+	def reset(self):
+		self.seconds, self.calls, self.peakMB, self.profiles = {}, {}, {}, {}
+		self._profilers, self._peaks, self._tracing = [], [], False
+
+	def __getstate__(self):
+		return self.__dict__ | {'profiles': {}, '_profilers': [], '_peaks': [], '_tracing': False}
+
+	@contextlib.contextmanager
+	def __call__(self, phase):
+		self.enter()
+		t = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.seconds[phase] = self.seconds.get(phase, 0) + time.perf_counter()-t
+			self.calls[phase] = self.calls.get(phase, 0) + 1
+			self.exit(phase)
+
+	def enter(self):
+		if self.profile:
+			[p.disable() for p in self._profilers[-1:]];
+			self._profilers.append(cProfile.Profile())
+			self._profilers[-1].enable()
+		if self.trace:
+			if not self._peaks and not tracemalloc.is_tracing():
+				tracemalloc.start()
+				self._tracing = True
+			if self._peaks:
+				self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+			tracemalloc.reset_peak()
+			self._peaks.append(0)
+
+	def exit(self, phase):
+		if self.profile:
+			p = self._profilers.pop()
+			p.disable()
+			self.profiles[phase] = pstats.Stats(p) if phase not in self.profiles else self.profiles[phase].add(p)
+			[p.enable() for p in self._profilers[-1:]];
+		if self.trace:
+			peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+			self.peakMB[phase] = max(self.peakMB.get(phase, 0), peak/2**20)
+			if self._peaks:
+				self._peaks[-1] = max(self._peaks[-1], peak)
+			elif self._tracing:
+				tracemalloc.stop()
+				self._tracing = False
+
+	def report(self, size = None):
+		""" pd.Series with seconds, calls (and peak memory in MB) per phase, and problem dimensions ('size') """
+		return pd.concat({k: pd.Series(v, dtype = np.float64) for k,v in {'seconds': self.seconds, 'calls': self.calls, 'peakMB': self.peakMB, 'size': noneInit(size, {})}.items() if v}, names = ['', 'phase'])
+
+	def printProfile(self, phase, sort = 'cumulative', n = 20):
+		self.profiles[phase].stream = sys.stdout
+		self.profiles[phase].sort_stats(sort).print_stats(n)
+
+# MEMOIZATION: Values derived from database symbols are cached along with the symbols they read. A cached value is valid as long as none of 
+# these symbols have been reassigned in the database (e.g. by db[k] = v or db.addOrMerge). Cached objects are shared, and should not be modified in place.
+_dbReads = [] # symbols read by the computations in progress (innermost last)
+
+class dbRecorder:
+	""" Wraps a database and records the symbols that are read through it in the innermost computation in progress """
+	def __init__(self, db):
+		self.__dict__['db'] = db
+
+	def __getattr__(self, attr):
+		if attr == 'db':
+			raise AttributeError(attr)
+		return getattr(self.db, attr)
+
+	def __getitem__(self, k):
+		if _dbReads:
+			_dbReads[-1][k] = symbolToken(self.db, k)
+		return self.db[k]
+
+	def __setitem__(self, k, v):
+		self.db[k] = v
+
+	def __contains__(self, k):
+		return k in self.db
+
+	def __iter__(self):
+		return iter(self.db)
+
+	def __len__(self):
+		return len(self.db)
+
+def unwrapDb(db):
+	return db.db if isinstance(db, dbRecorder) else db
+
+def symbolToken(db, k):
+	""" Key and object of the symbol that db[k] is read from (aliases are resolved to the original symbol) """
+	if k not in db.symbols:
+		k = next((x for x,y in db.alias if y == k), k)
+	return k, db.symbols.get(k)
+
+def validReads(db, reads):
+	return all(db.symbols.get(k) is v for k,v in reads.values())
+
+def memoized(memo, key, db, compute):
+	""" Returns memo[key] if none of the symbols it read from db have been reassigned; otherwise compute() and record the symbols it reads. 
+		The symbols are also added to the reads of the enclosing computation (if any). """
+	if key in memo and validReads(db, memo[key][1]):
+		value, reads = memo[key]
+	else:
+		_dbReads.append({})
+		try:
+			value = compute()
+		finally:
+			reads = _dbReads.pop()
+		memo[key] = (value, reads)
+	if _dbReads:
+		_dbReads[-1].update(reads)
+	return value
+
+def dbProperty(f):
+	""" Property of a model that is computed from self.db and cached until one of the symbols it reads is reassigned """
+	@property
+	@functools.wraps(f)
+	def wrapper(self):
+		return memoized(self.__dict__.setdefault('_dbMemo', {}), f.__qualname__, unwrapDb(self.db), lambda: withRecorder(self, f))
+	return wrapper
+
+def withRecorder(model, f):
+	""" Evaluate f(model) with reads from model.db recorded """
+	if isinstance(model.db, dbRecorder):
+		return f(model)
+	db, model.db = model.db, dbRecorder(model.db)
+	try:
+		return f(model)
+	finally:
+		model.db = db
+
+def dbMemo(f):
+	""" Cache f(*args, db) per database (the last positional argument) and the remaining arguments (lists are treated as tuples) until one of 
+		the symbols it reads is reassigned """
+	memos = weakref.WeakKeyDictionary()
+	@functools.wraps(f)
+	def wrapper(*args):
+		db = unwrapDb(args[-1])
+		key = tuple(tuple(x) if is_iterable(x) else x for x in args[:-1])
+		return memoized(memos.setdefault(db, {}), key, db, lambda: f(*args[:-1], dbRecorder(db)))
+	return wrapper
+
 # SPARSE METHODS
 def sparseSeries(values, index=None, name = None, fill_value = 0, dtype = None):
 	""" initialize sparse version of series """
@@ -115,6 +346,14 @@ def sparseEmptySeries(size, fill_value=0, index = None, name = None):
 	""" initalize sparse version of empty series of given size """
 	return pd.Series(pd.arrays.SparseArray(np.empty(size), fill_value=fill_value),index = index, name = name)
 
+def cscFromCoo(data, rows, cols, shape):
+	""" CSC matrix from coordinates, and the permutation of data into the CSC order (None if there are duplicate entries; these are summed) """
+	order = np.lexsort((rows, cols))
+	rows, cols = rows[order], cols[order]
+	if ((np.diff(cols) == 0) & (np.diff(rows) == 0)).any():
+		return sparse.coo_matrix((data[order], (rows, cols)), shape = shape).tocsc(), None
+	return sparse.csc_matrix((data[order], rows, np.concatenate([[0], np.cumsum(np.bincount(cols, minlength = shape[1]))])), shape = shape), order
+
 def sparseMatrixFromSeries(s, columns):
 	colIds = s.groupby(columns).ngroup().values
 	rowIds = s.groupby([name for name in s.index.names if name not in columns]).ngroup().values
@@ -123,15 +362,77 @@ def sparseMatrixFromSeries(s, columns):
 # ITERATION METHODS - not sparse
 def sumIte(ite,fill_value=0):
 	""" Sum using broadcasting methods on iterative object """
+	if fill_value == 0 and sameDomains(ite):
+		return groupedReduce(ite, sumGroups)
 	return reduce(lambda x,y: adjMultiIndex.bcAdd(x,y,fill_value=fill_value), ite)
 
 def maxIte(ite):
 	""" Returns max of symbols in ite; ignores NaN unless all columns use it. """
+	if sameDomains(ite):
+		return groupedReduce(ite, ufuncGroups(np.fmax))
 	return pd.concat(ite, axis=1).max(axis=1) if isinstance(ite[0], pd.Series) else max([noneInit(x,np.nan) for x in ite])
 
 def minIte(ite):
+	if sameDomains(ite):
+		return groupedReduce(ite, ufuncGroups(np.fmin))
 	return pd.concat(ite, axis=1).min(axis=1) if isinstance(ite[0], pd.Series) else min([noneInit(x,np.nan) for x in ite])
 
+def sameDomains(ite):
+	""" True if ite holds more than one series and all are defined over the same (named) levels """
+	return (len(ite)>1 and all(isinstance(x, pd.Series) for x in ite) and None not in ite[0].index.names and 
+			len(set(ite[0].index.names)) == ite[0].index.nlevels and all(set(x.index.names) == set(ite[0].index.names) for x in ite))
+
+def groupedReduce(ite, kernel):
+	""" Reduce series defined over the same levels in a single pass: The indices are stacked on level codes (with levels united once), and values 
+		are reduced by group with kernel(values, groups, nGroups); if all indices are equal, the kernel folds a list of aligned value arrays 
+		instead (groups = None). Returns a sorted series over the union of the indices. """
+	names = list(ite[0].index.names)
+	indices = [x.index.reorder_levels(names) if isinstance(x.index, pd.MultiIndex) else x.index for x in ite]
+	if all(i.equals(indices[0]) for i in indices[1:]):
+		s = pd.Series(kernel([np.asarray(x.values, dtype = np.float64) for x in ite], None, len(indices[0])), index = indices[0])
+		return s if s.index.is_monotonic_increasing else s.sort_index()
+	levelsCodes = [indexLevelCodes(i) for i in indices]
+	levels = [unionIndex([lc[0][k] for lc in levelsCodes]) for k in range(len(names))]
+	codes = [np.hstack([np.where(lc[1][k]>=0, levels[k].get_indexer(lc[0][k])[lc[1][k]], -1) for lc in levelsCodes]) for k in range(len(names))]
+	groups, first = groupIds(joinKeys([c+1 for c in codes], [len(l)+1 for l in levels]), np.prod([len(l)+1 for l in levels], dtype = float))
+	values = kernel(np.hstack([np.asarray(x.values, dtype = np.float64) for x in ite]), groups, len(first))
+	if len(names) == 1:
+		return pd.Series(values, index = levels[0].take(codes[0][first], allow_fill = True).rename(names[0]))
+	return pd.Series(values, index = pd.MultiIndex(levels = levels, codes = [c[first] for c in codes], names = names, verify_integrity = False))
+
+def groupIds(keys, size):
+	""" Group of each key (groups are numbered in the order of keys) and the position of the first key in each group. If the key space is small 
+		relative to the number of keys, groups are found by counting instead of sorting. """
+	if size > 4*len(keys):
+		uniques, first, groups = np.unique(keys, return_index = True, return_inverse = True)
+		return groups.ravel(), first
+	occupied = np.zeros(int(size), dtype = bool)
+	occupied[keys] = True
+	groups = (np.cumsum(occupied)-1)[keys]
+	first = np.empty(occupied.sum(), dtype = np.int64)
+	first[groups[::-1]] = np.arange(len(keys))[::-1]
+	return groups, first
+
+def sumGroups(values, groups, n):
+	""" Sum by group ignoring NaN (NaN if all values in the group are NaN) """
+	if groups is None:
+		return reduce(nanAdd if any(np.isnan(v).any() for v in values) else np.add, values)
+	valid = ~np.isnan(values)
+	return np.where(np.bincount(groups, weights = valid, minlength = n)>0, np.bincount(groups, weights = np.where(valid, values, 0), minlength = n), np.nan)
+
+def nanAdd(x, y):
+	""" x+y where NaN is treated as missing """
+	return np.where(np.isnan(x), y, np.where(np.isnan(y), x, x+y))
+
+def ufuncGroups(ufunc):
+	""" Reduce by group with a NaN-ignoring ufunc such as np.fmax or np.fmin """
+	def kernel(values, groups, n):
+		if groups is None:
+			return reduce(ufunc, values)
+		order = np.argsort(groups, kind = 'stable')
+		return ufunc.reduceat(values[order], np.searchsorted(groups[order], np.arange(n)))
+	return kernel
+
 def stackValues(ite):
 	return np.hstack([f.values for f in ite])
 
@@ -147,6 +448,24 @@ def stackIte(varsDict,fill_value=0, btype = 'v', addFullIndex= True):
 	return stackSeries(fvars, names = stdNames(btype))
 
 # Auxiliary functions that help create suitable parameter inputs:
+def pruneDomain(index, s):
+	""" Elements of index except those where s (defined over a subset of the levels in index) is zero """
+	zeros = s.index[s == 0]
+	return index if zeros.empty else index[~subIndex(index, list(zeros.names)).isin(zeros)]
+
+def fillZeros(s, index):
+	""" s on index (a superset of its index) with zeros for the missing elements """
+	return (s.reorder_levels(index.names) if isinstance(s.index, pd.MultiIndex) else s).reindex(index, fill_value = 0)
+
+def fillZerosDual(s, index):
+	""" Dual values s (with the level '_type') on index with zeros for the missing elements """
+	types = list(s.index.get_level_values('_type').unique())
+	return dualSlice([fillZeros(s.xs(t, level = '_type'), index).values for t in types], index, types)
+
+def mulLevel(s, w, level):
+	""" Multiply s by w (defined over 'level'); elements of s that are not in w are unchanged """
+	return s * w.reindex(s.index.get_level_values(level)).fillna(1).values
+
 def appIndexWithCopySeries(s, copyLevel, newLevel):
 	s.index = appendIndexWithCopy(s.index,copyLevel,newLevel)
 	return s
@@ -0,0 +1,140 @@
+""" Benchmark runner for the LP model families.
+
+Example (from the py folder):
+	python benchmark.py --models mBasicInt mBasicPH --sizes small large --hScale 1 2 --out benchmark.jsonl
+
+Each run is appended as one json line to --out with timings per phase, problem dimensions, and peak memory, such that
+results can be compared across commits. Runs are executed in fresh processes (unless --inProcess) so that the peak
+resident memory is measured per run. """
+import os, sys, json, time, argparse, importlib, subprocess, resource, io, contextlib, warnings
+import numpy as np, pandas as pd, pyDbs
+from functools import reduce
+from pyDbs import read, readSets, noneInit
+
+_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Data')
+_K1 = {'variables': ['Fundamentals', 'Load','Generators_Other'], 'variable2D': ['Generators_FuelMix'], 'scalars': ['Scalars'], 'maps': ['Generators_Categories']}
+_K2 = {'variables': ['Fundamentals', 'Load', 'Generators_Other'], 'variable2D': ['Generators_FuelMix','HourlyVariation'], 'scalars': ['Scalars'], 'maps': ['Generators_Categories']}
+_K3 = {'variables': ['Fundamentals', 'Load', 'Generators_Other','TL'], 'variable2D': ['Generators_FuelMix','HourlyVariation'], 'scalars': ['Scalars'], 'maps': ['Generators_Categories','Load_Categories']}
+_K4 = {'variables': ['Fundamentals', 'LoadVariables', 'TransmissionLines', 'GeneratorsVariables'], 'maps': ['LoadMaps','GeneratorsMaps'], 'variable2D': ['HourlyVariation'], 'scalars': ['Scalars']}
+_K5 = {'variables': ['Fundamentals', 'LoadVariables', 'TransmissionLines', 'GeneratorsVariables','StorageVariables','Regulation'], 'maps': ['LoadMaps','GeneratorsMaps','StorageMaps'], 'variable2D': ['HourlyVariation'], 'scalars': ['Scalars']}
+_K6 = {'variables': ['Fundamentals', 'LoadVariables', 'TransmissionLines', 'GeneratorsVariables','Regulation'], 'maps': ['LoadMaps','GeneratorsMaps'], 'variable2D': ['HourlyVariation'], 'scalars': ['Scalars']}
+_K7 = {'variables': ['Fundamentals', 'LoadVariables', 'TransmissionLines', 'GeneratorsVariables','Regulation'], 'maps': ['LoadMaps','GeneratorsMaps'], 'variable2D': ['HourlyVariation','LoadVariation_E','LoadVariation_H'], 'scalars': ['Scalars']}
+
+# model family: (workbook, arguments for read.dbFromWB, types for readSets)
+CASES = {'mBasic': ('mBasic.xlsx', _K1, None),
+		 'mBasicInt': ('mBasicInt.xlsx', _K2, None),
+		 'mBasicTrade': ('mBasicTrade.xlsx', _K3, None),
+		 'mBasicPH': ('mBasicPH.xlsx', _K4, ['variable','set']),
+		 'mBasicPH_storage': ('mBasicPH_storage.xlsx', _K5, ['variable','set']),
+		 'mGFBasic': ('mGFBasic.xlsx', _K1, None),
+		 'mGFInt': (os.path.join(os.pardir, 'Documentation', 'Data', 'mGFInt.xlsx'), _K2, None),
+		 'mGFTrade': ('mGFTrade.xlsx', _K6, ['variable','set']),
+		 'mGFPH': ('mGFPH.xlsx', _K7, ['variable','set'])}
+
+def workbook(model, size = 'small'):
+	""" Path to data for model (None if the size is not available) """
+	path = os.path.join(_data, CASES[model][0])
+	path = path.replace('.xlsx', 'Large.xlsx') if size == 'large' else path
+	return path if os.path.isfile(path) else None
+
+def loadDb(model, size = 'small', hScale = 1):
+	db = read.dbFromWB(workbook(model, size = size), CASES[model][1])
+	scaleHours(db, hScale)
+	readSets(db, types = CASES[model][2])
+	return db
+
+def scaleHours(db, hScale):
+	""" Synthetically scale the number of hours by repeating all symbols defined over 'h' hScale times """
+	if hScale == 1:
+		return db
+	[db.__setitem__(k, repeatHours(v, hScale)) for k,v in db.symbols.items() if isinstance(v, (pd.Series, pd.Index)) and 'h' in pyDbs.getIndex(v).names];
+	return db
+
+def repeatHours(v, hScale):
+	h = pyDbs.getIndex(v).get_level_values('h').unique()
+	maps = [{x: (x+r*len(h) if isinstance(x, (int, np.integer)) else f'{x}_{r}') for x in h} for r in range(hScale)]
+	if isinstance(v, pd.Series):
+		return pd.concat([v.rename(index = m, level = 'h') for m in maps])
+	elif isinstance(v, pd.MultiIndex):
+		return reduce(pd.Index.append, [v.set_levels(v.levels[v.names.index('h')].map(m), level = 'h') for m in maps])
+	else:
+		return reduce(pd.Index.append, [v.map(m) for m in maps])
+
+def compareDb(db, ref, prefix = 'λ_'):
+	""" Largest absolute deviation of the symbols in db from ref for symbols starting with prefix (and Welfare) """
+	def maxDiff(v, w):
+		if not isinstance(v, pd.Series):
+			return abs(float(w)-float(v))
+		w = w.reorder_levels(v.index.names) if isinstance(v.index, pd.MultiIndex) else w
+		return float((w.reindex(v.index).fillna(0)-v).abs().max())
+	return {k: maxDiff(v, db[k]) if k in db.symbols else None for k,v in ref.symbols.items() if k.startswith(prefix) or k == 'Welfare'}
+
+def runCase(model, size = 'small', hScale = 1, cls = 'mSimple', modelKwargs = None, trace = False, compare = False):
+	""" Returns a dictionary with the model timings (seconds per phase, see modelShell.timings; phases are nested, e.g. 'solve' includes 
+		the lpBlock compile steps, 'solver', and 'postSolve'), problem dimensions, and memory use for one run. With compare = True, the model 
+		is also solved without modelKwargs (as one LP), and the largest deviations of the duals (λ_*) and Welfare from this solution are 
+		reported ('compare'; 'maxDualDiff'). Note that duals are only comparable where the optimal dual solution is unique. """
+	out = {'model': model, 'cls': cls, 'size': size, 'hScale': hScale, 'modelKwargs': noneInit(modelKwargs, {})}
+	try:
+		with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+			warnings.simplefilter('ignore')
+			t = time.perf_counter()
+			db = loadDb(model, size = size, hScale = hScale)
+			out['load'] = time.perf_counter()-t
+			m = getattr(importlib.import_module(model), cls)(db, trace = trace, **noneInit(modelKwargs, {}))
+			m()
+			if compare:
+				ref = loadDb(model, size = size, hScale = hScale)
+				getattr(importlib.import_module(model), cls)(ref)()
+				out['compare'] = compareDb(db, ref)
+				out['maxDualDiff'] = max((v for k,v in out['compare'].items() if k.startswith('λ_') and v is not None), default = None)
+		out.update({'status': int(m.solveStats['status']), 'nit': int(noneInit(m.solveStats['nit'], -1)), 'Welfare': float(db['Welfare']) if 'Welfare' in db.symbols else None} | m.timings['size'].astype(int).to_dict())
+	except Exception as e:
+		out.update({'status': 'error', 'error': f'{type(e).__name__}: {e}'})
+		m = locals().get('m')
+	if hasattr(m, 'log'):
+		out.update(m.log.seconds | {f'peakMB_{k}': v for k,v in m.log.peakMB.items()})
+	out['peakRSSMB'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/2**10
+	return out
+
+def gitCommit():
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True, cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+	except OSError:
+		return None
+
+def runSubprocess(kwargs):
+	""" Run a single case in a fresh python process (such that peak memory is measured per run) """
+	p = subprocess.run([sys.executable, os.path.abspath(__file__), '--single', json.dumps(kwargs)], capture_output = True, text = True, cwd = os.path.dirname(os.path.abspath(__file__)))
+	return json.loads(p.stdout.splitlines()[-1]) if p.returncode == 0 and p.stdout else kwargs | {'status': 'error', 'error': p.stderr[-2000:]}
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--models', nargs = '+', default = list(CASES), choices = list(CASES))
+	parser.add_argument('--sizes', nargs = '+', default = ['small','large'], choices = ['small','large'])
+	parser.add_argument('--hScale', nargs = '+', type = int, default = [1], help = 'Repeat the hourly data this many times')
+	parser.add_argument('--cls', default = 'mSimple', help = 'Model class in each module')
+	parser.add_argument('--modelKwargs', type = json.loads, default = {}, help = """Json with keyword arguments for the model, e.g. '{"compileMode": "codes"}'""")
+	parser.add_argument('--repeat', type = int, default = 1)
+	parser.add_argument('--trace', action = 'store_true', help = 'Record peak memory per phase traced by tracemalloc (slows down the run)')
+	parser.add_argument('--compare', action = 'store_true', help = 'Compare duals and Welfare with the solution of the model without modelKwargs')
+	parser.add_argument('--inProcess', action = 'store_true', help = 'Run cases in this process (peak RSS is then cumulative)')
+	parser.add_argument('--out', default = 'benchmark.jsonl')
+	parser.add_argument('--single', help = argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+	if args.single:
+		print(json.dumps(runCase(**json.loads(args.single))))
+		return
+	commit, stamp = gitCommit(), time.strftime('%Y-%m-%dT%H:%M:%S')
+	cases = [{'model': model, 'size': size, 'hScale': h, 'cls': args.cls, 'modelKwargs': args.modelKwargs, 'trace': args.trace, 'compare': args.compare}
+			 for model in args.models for size in args.sizes for h in args.hScale if workbook(model, size = size)]
+	with open(args.out, 'a') as file:
+		for kwargs in cases:
+			for i in range(args.repeat):
+				res = {'commit': commit, 'timestamp': stamp, 'repeat': i} | (runCase(**kwargs) if args.inProcess else runSubprocess(kwargs))
+				file.write(json.dumps(res)+'\n')
+				file.flush()
+				print(f"{res['model']:<18}{res['size']:<7}h x{res['hScale']:<3}{str(res['status']):<7}solve {res.get('solve', float('nan')):8.3f}s  solver {res.get('solver', float('nan')):8.3f}s  peak {res.get('peakRSSMB', float('nan')):8.1f}MB"+(f"  max dual diff {res.get('maxDualDiff')}" if args.compare else ''))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,103 @@
+import os, json, hashlib, shutil, tempfile
+import numpy as np, pandas as pd, pyDbs
+from pyDbs import read, noneInit
+
+# Columnar on-disk cache of databases read from Excel workbooks. Each symbol is stored as a set of .npy arrays
+# (values, and levels + integer codes for each index level) in a folder keyed on the hash of the workbook and read settings.
+# Numeric arrays are memory-mapped when the cache is loaded.
+
+def dbFromWB(workbook, kwargs, spliton = '/', cacheDir = None):
+	""" Cached version of pyDbs.read.dbFromWB. The cache is stored in cacheDir (default: folder '_dbCache' next to the workbook). """
+	path = cachePath(workbook, kwargs, spliton = spliton, cacheDir = cacheDir)
+	if os.path.isfile(os.path.join(path, 'manifest.json')):
+		return readCache(path)
+	db = read.dbFromWB(workbook, kwargs, spliton = spliton)
+	writeCache(db, path)
+	return db
+
+def cachePath(workbook, kwargs, spliton = '/', cacheDir = None):
+	h = hashlib.sha256()
+	with open(workbook, 'rb') as file:
+		[h.update(chunk) for chunk in iter(lambda: file.read(1 << 20), b'')];
+	h.update(json.dumps([kwargs, spliton], sort_keys = True).encode())
+	return os.path.join(noneInit(cacheDir, os.path.join(os.path.dirname(os.path.abspath(workbook)), '_dbCache')), f"{os.path.splitext(os.path.basename(workbook))[0]}_{h.hexdigest()[:16]}")
+
+def writeCache(db, path):
+	""" Write symbols to a temporary folder first, such that an interrupted write never leaves a partial cache at path """
+	os.makedirs(os.path.dirname(path), exist_ok = True)
+	tmp = tempfile.mkdtemp(dir = os.path.dirname(path))
+	arrays = []
+	manifest = {'name': db.name, 'alias': [list(x) for x in db.alias], 'symbols': {k: encodeSymbol(v, arrays) for k,v in db.symbols.items()}}
+	[np.save(os.path.join(tmp, f'{i}.npy'), a, allow_pickle = a.dtype == object) for i,a in enumerate(arrays)];
+	with open(os.path.join(tmp, 'manifest.json'), 'w') as file:
+		json.dump(manifest, file)
+	shutil.rmtree(path, ignore_errors = True)
+	os.replace(tmp, path)
+
+def readCache(path):
+	with open(os.path.join(path, 'manifest.json')) as file:
+		manifest = json.load(file)
+	load = lambda i, mmap_mode = 'r': np.load(os.path.join(path, f'{i}.npy'), mmap_mode = mmap_mode, allow_pickle = mmap_mode is None)
+	return pyDbs.SimpleDB(name = manifest['name'], symbols = {k: decodeSymbol(v, load) for k,v in manifest['symbols'].items()}, alias = [tuple(x) for x in manifest['alias']])
+
+# Encoding of symbols:
+def encodeSymbol(s, arrays):
+	if isinstance(s, pd.Series):
+		return {'type': 'variable', 'name': s.name, 'values': encodeArray(s.values, arrays), 'index': encodeIndex(s.index, arrays)}
+	elif isinstance(s, pd.Index):
+		return {'type': 'set', 'index': encodeIndex(s, arrays)}
+	elif isinstance(s, np.generic):
+		return {'type': 'scalar', 'dtype': s.dtype.str, 'value': s.item()}
+	else:
+		a = np.empty(1, dtype = object)
+		a[0] = s
+		return {'type': 'other', 'values': encodeArray(a, arrays)}
+
+def decodeSymbol(d, load):
+	if d['type'] == 'variable':
+		return pd.Series(decodeArray(d['values'], load), index = decodeIndex(d['index'], load), name = d['name'])
+	elif d['type'] == 'set':
+		return decodeIndex(d['index'], load)
+	elif d['type'] == 'scalar':
+		return np.dtype(d['dtype']).type(d['value'])
+	else:
+		return decodeArray(d['values'], load)[0]
+
+def encodeIndex(index, arrays):
+	if isinstance(index, pd.MultiIndex):
+		return {'names': list(index.names), 'levels': [encodeArray(l.values, arrays) for l in index.levels], 'codes': [encodeArray(np.asarray(c), arrays) for c in index.codes]}
+	else:
+		return {'names': [index.name], 'values': encodeArray(index.values, arrays)}
+
+def decodeIndex(d, load):
+	if 'levels' in d:
+		return pd.MultiIndex(levels = [pd.Index(decodeArray(l, load), dtype = np.dtype(l['dtype'])) for l in d['levels']], codes = [decodeArray(c, load) for c in d['codes']], names = d['names'], verify_integrity = False)
+	else:
+		return pd.Index(decodeArray(d['values'], load), name = d['names'][0], dtype = np.dtype(d['values']['dtype']))
+
+def encodeArray(a, arrays):
+	""" Object arrays of strings are stored as unicode arrays; object arrays of ints/floats are stored as floats (with a mask for ints);
+		other object arrays are pickled. Other dtypes are stored as is. """
+	d = {'dtype': a.dtype.str, 'kind': 'native', 'id': len(arrays)}
+	if a.dtype != object:
+		arrays.append(np.asarray(a))
+	elif all(isinstance(x, str) for x in a):
+		d['kind'] = 'str'
+		arrays.append(a.astype(str))
+	elif all(isinstance(x, (int, float, np.integer, np.floating)) and not isinstance(x, (bool, np.bool_)) for x in a) and all(abs(x) < 2**53 for x in a if isinstance(x, (int, np.integer))):
+		d.update({'kind': 'num', 'mask': len(arrays)+1})
+		arrays += [a.astype(np.float64), np.array([isinstance(x, (int, np.integer)) for x in a], dtype = bool)]
+	else:
+		d['kind'] = 'pickle'
+		arrays.append(a)
+	return d
+
+def decodeArray(d, load):
+	a = load(d['id'], mmap_mode = None if d['kind'] == 'pickle' else 'r')
+	if d['kind'] == 'str':
+		return a.astype(object)
+	elif d['kind'] == 'num':
+		mask, out = np.asarray(load(d['mask'])), a.astype(object)
+		out[mask] = a[mask].astype(np.int64).astype(object)
+		return out
+	return a
@@ -4,12 +4,30 @@ _blocks = ('c','l','u','b_eq','b_ub','A_eq','A_ub')
 _stdLinProg = ('c', 'A_ub','b_ub','A_eq','b_eq','bounds')
 
 class lpBlock:
-	def __init__(self, globalDomains=None, **kwargs):
+	def __init__(self, globalDomains=None, compileMode = 'index', incremental = False, weights = None, **kwargs):
+		""" compileMode = 'index' stacks symbols in tuple-based MultiIndices; compileMode = 'codes' assigns each symbol a contiguous
+			range of integers and builds the coefficient matrices from level codes (the tuple-based global indices are built lazily).
+			incremental = True (requires compileMode = 'codes') reuses the compiled sparsity pattern and global indices when only the
+			values of parameters have changed since the last call, and patches the affected numeric arrays. 
+			weights = {level: pd.Series} weighs elements of a level, e.g. representative hours (see timeAggregation): Costs of variables defined 
+			over the level are multiplied by the weights relative to their mean, and coefficients in constraints that sum over the level (i.e. 
+			constraints not defined over the level or its alias level+'_constr') are multiplied by the weights. """
 		self.globalDomains=noneInit(globalDomains, {})
+		self.weights = noneInit(weights, {})
+		self.compileMode = compileMode
+		self.incremental = incremental
+		self.changed = set()
+		self.template = False
+		self.log = phaseLog()
+		self._lpCache = {}
 		self.parameters = {k: {} for k in _blocks}
 		self.compiled = {k: {} for k in _blocks}
 		self.denseArgs = dict.fromkeys(_blocks)
 		self.gIndex = {}
+		self._globalVariableIndex, self._globalConstraintIndex, self._globalMaps, self._symbolTable = None, None, None, None
+
+	def __setstate__(self, state):
+		self.__dict__.update({'compileMode': 'index', 'incremental': False, 'weights': {}, 'changed': set(), 'template': False, 'log': phaseLog(), '_lpCache': {}, '_globalVariableIndex': None, '_globalConstraintIndex': None, '_globalMaps': None, '_symbolTable': None} | state)
 
 	def checkGlobalDomains(self, key, value, defaultValue = 0, conditions=None):
 		if key in self.globalDomains:
@@ -17,36 +35,53 @@ class lpBlock:
 		else:
 			return noneInit(value, defaultValue)
 
+	def setParameter(self, t, key, value):
+		""" Add parameter and keep track of the (t, key) entries that have changed since the last compilation """
+		if not (key in self.parameters[t] and sameSymbol(self.parameters[t][key], value)):
+			self.changed.add((t, key))
+		self.parameters[t][key] = value
+
 	def addVector(self, t, func, component, value, name = None, conditions = None):
+		w = self.weighObjective if t == 'c' else lambda x: x
 		if isinstance(value, pd.Series):
-			self.parameters[t][(name, component)] = adj.rc_pd(value, c = conditions)
+			self.setParameter(t, (name, component), w(adj.rc_pd(value, c = conditions)))
 		elif isinstance(value, (int,float,np.generic, type(None))):
-			self.parameters[t][(name, component)] =  self.checkGlobalDomains(name, value, conditions=conditions)
+			self.setParameter(t, (name, component), w(self.checkGlobalDomains(name, value, conditions=conditions)))
 		elif is_iterable(value):
-			self.parameters[t][(name, component)] = adj.rc_pd(func(value), c = conditions)
+			self.setParameter(t, (name, component), w(adj.rc_pd(func(value), c = conditions)))
 		else:
 			raise TypeError(f"The argument '({name}, {component})' added to {t}-blocks should be of type pd.Series, scalar, or an iterable object.")
 
 	def addVectorConstraint(self, t, func, value, name = None, conditions = None):
 		if isinstance(value, pd.Series):
-			self.parameters[t][name] = adj.rc_pd(value, c = conditions)
+			self.setParameter(t, name, adj.rc_pd(value, c = conditions))
 		elif isinstance(value, (int,float,np.generic, type(None))):
-			self.parameters[t][name] =  self.checkGlobalDomains(name, value, conditions = conditions)
+			self.setParameter(t, name, self.checkGlobalDomains(name, value, conditions = conditions))
 		elif is_iterable(value):
-			self.parameters[t][name] = adj.rc_pd(func(value), c = conditions)
+			self.setParameter(t, name, adj.rc_pd(func(value), c = conditions))
 		else:
 			raise TypeError(f"The argument '{name}' added to {t}-blocks should be of type pd.Series, scalar, or an iterable object.")
 
 	def addMatrix(self, t, component, value, varName = None, constrName = None, conditions=None):
 		if isinstance(value, pd.Series):
-			self.parameters[t][(constrName, varName, component)] = adj.rc_pd(value, c = conditions)
+			self.setParameter(t, (constrName, varName, component), adj.rc_pd(value, c = conditions))
 		elif isinstance(value, (int, float, np.generic, type(None))):
-			self.parameters[t][(constrName, varName, component)] = adjMultiIndex.bcAdd(self.checkGlobalDomains(constrName, value, conditions = conditions), self.checkGlobalDomains(varName, 0, conditions=conditions))
+			self.setParameter(t, (constrName, varName, component), adjMultiIndex.bcAdd(self.checkGlobalDomains(constrName, value, conditions = conditions), self.checkGlobalDomains(varName, 0, conditions=conditions)))
 		elif is_iterable(value):
-			self.parameters[t][(constrName, varName, component)] = adj.rc_pd(sumIte(value), c = conditions)
+			self.setParameter(t, (constrName, varName, component), adj.rc_pd(sumIte(value), c = conditions))
 		else:
 			raise TypeError(f"The argument '({varName}, {constrName}, {component})' added to {t}-blocks should be of type pd.Series, scalar, or an iterable object.")
 
+	def weighObjective(self, v):
+		if not isinstance(v, pd.Series):
+			return v
+		return reduce(lambda x, k: mulLevel(x, self.weights[k]/self.weights[k].mean(), k), [k for k in self.weights if k in pyDbs.getDomains(v)], v)
+
+	def weighConstraint(self, A, b):
+		if not isinstance(A, pd.Series):
+			return A
+		return reduce(lambda x, k: mulLevel(x, self.weights[k], k), [k for k in self.weights if k in pyDbs.getDomains(A) and not {k, k+'_constr'}.intersection(pyDbs.getDomains(b))], A)
+
 	def add_c(self, component=None, value = None, varName = None, conditions=None):
 		self.addVector('c',sumIte,component, value, name = varName, conditions=conditions)
 
@@ -68,28 +103,47 @@ class lpBlock:
 	def add_A_ub(self, component = None, value = None, varName = None, constrName = None, conditions=None):
 		self.addMatrix('A_ub', component, value, varName = varName, constrName = constrName, conditions=conditions)
 
+	def indexVariable(self, name, v, btype = 'v'):
+		return nIndexVariable(v) if self.compileMode == 'codes' else fIndexVariable(name, v, btype = btype)
 	def compileVector(self, t, func, name, checkTupleIndex = 0):
-		self.compiled[t][name] = fIndexVariable(name, func([v for k,v in self.parameters[t].items() if k[checkTupleIndex] == name]))
+		self.compiled[t][name] = self.indexVariable(name, func([v for k,v in self.parameters[t].items() if k[checkTupleIndex] == name]))
 	def compileVectorConstraint(self, t, name, btype):
-		self.compiled[t][name] = fIndexVariable(name, self.parameters[t][name], btype = btype)
-	def compileMatrix(self, t, constrName, varName):
+		self.compiled[t][name] = self.indexVariable(name, self.parameters[t][name], btype = btype)
+	def compileMatrix(self, t, constrName, varName, compiled = None):
 		A, b = sumIte([v for k,v in self.parameters[f'A_{t}'].items() if k[0:2] == (constrName, varName)]), self.parameters[f'b_{t}'][constrName]
+		A = self.weighConstraint(A, b)
 		overlap = set(pyDbs.getDomains(A)).intersection(pyDbs.getDomains(b))
 		onlyA = set(pyDbs.getDomains(A))-overlap
-		if not overlap:
+		if self.compileMode == 'codes':
+			full = self.joinMatrix(t, constrName, varName, A, pyDbs.getIndex(b))
+		elif not overlap:
 			full = adjMultiIndex.bc(fIndexVariable(varName, A), fIndex(constrName, pyDbs.getIndex(b), btype=t))
 		else:
-			full = adjMultiIndex.bc(A, pyDbs.getIndex(b))
+			full = self.joinMatrix(t, constrName, varName, A, pyDbs.getIndex(b))
 			if not onlyA:
 				full.index = pyDbs.cartesianProductIndex([fIndex(varName, None), fIndex(constrName, full.index, btype=t)])
 			else:
 				f1, f2 = fIndex(varName, full.index.droplevel(list(set(pyDbs.getDomains(A))-onlyA)) ), fIndex(constrName, full.index.droplevel(list(onlyA)), btype=t)
 				full.index = pd.MultiIndex.from_arrays(np.concatenate([f1.to_frame(index=False).values, f2.to_frame(index=False)], axis=1).T, names = stdNames('v')+stdNames(t))
-			if full.index.to_frame(index=False).isna().any(axis=None):
-				print(f"""Warning: The coefficient matrix 'A_{t}' for constraint '{constrName}' and variable '{varName}' includes nan indices. 
-	This is likely due to missing domains either in the relevant 'b_{t}' vector or the 'A_{t}'. """)
 		full.index._nA, full.index._nb = sorted(onlyA), sorted(pyDbs.getDomains(b))
-		self.compiled[f'A_{t}'][(constrName, varName)] = full
+		noneInit(compiled, self.compiled[f'A_{t}'])[(constrName, varName)] = full
+
+	def joinMatrix(self, t, constrName, varName, A, b):
+		""" Broadcast the coefficients A to the domain b of the constraint by joining on level codes. The position in b of each coefficient is 
+			stored in full.index._rows; coefficients without a match in b are dropped. """
+		if isinstance(A, pd.Series) and b is not None:
+			full, rows, missing = bcJoin(A, b)
+			if len(missing):
+				print(f"""Warning: The coefficient matrix 'A_{t}' for constraint '{constrName}' and variable '{varName}' includes {len(missing)} indices that are not in the domain of the constraint. 
+	This is likely due to missing domains either in the relevant 'b_{t}' vector or the 'A_{t}'. """)
+		elif isinstance(A, pd.Series):
+			full, rows = A.set_axis(A.index.copy()), np.zeros(len(A), dtype = np.int64)
+		elif b is not None:
+			full, rows = pd.Series(A, index = b.copy(), dtype = np.float64), np.arange(len(b))
+		else:
+			full, rows = pd.Series(A, index = [None], dtype = np.float64), np.zeros(1, dtype = np.int64)
+		full.index._rows = rows
+		return full
 
 	def compileParameters(self):
 		[self.compileVector('c', sumIte, name) for name in set([n[0] for n in self.parameters['c']])];
@@ -101,30 +155,78 @@ class lpBlock:
 	def settingsFromCompiled(self):
 		self.allvars = sorted(self.getVariables)
 		self.allconstr = {t: sorted(self.compiled[f'b_{t}']) for t in ('eq','ub')}
-		self.alldomains = ( {k:v.index._n for k,v in reduce(lambda x,y: x|y, [self.compiled[k] for k in ('c','l','u')]).items()} | 
+		self.alldomains = ( {k: nDomains(v) for k,v in reduce(lambda x,y: x|y, [self.compiled[k] for k in ('c','l','u')]).items()} | 
 							{k[1]: v.index._nA for k,v in self.compiled['A_eq'].items()} |
 							{k[1]: v.index._nA for k,v in self.compiled['A_ub'].items()} )
-		self.allconstrdomains = {k: self.compiled[f'b_{t}'][k].index._n for t in ('eq','ub') for k in self.allconstr[t]}
+		self.allconstrdomains = {k: nDomains(self.compiled[f'b_{t}'][k]) for t in ('eq','ub') for k in self.allconstr[t]}
 
 	@property
 	def getVariables(self):
 		return set([k[1] for l in [self.compiled['A_eq'],self.compiled['A_ub']] for k in l]).union(set.union(*[set(self.compiled[k]) for k in ('c','l','u')]))
 
 	def variableDomains(self, k):
+		if self.compileMode == 'codes':
+			return self.variableDomainsCodes(k)
 		index = reduce(pd.Index.union, ([self.compiled[t][k].index.levels[1] for t in ('c','l','u') if k in self.compiled[t]]+[self.compiled[t][v].index.levels[1] for t in ('A_eq','A_ub') for v in self.compiled[t] if v[1] == k]))
 		return None if index.empty else index
 
+	def variableDomainsCodes(self, k):
+		ite = ([self.compiled[t][k].index for t in ('c','l','u') if isinstance(self.compiled[t].get(k), pd.Series)]+
+			   [subIndex(v.index, v.index._nA) for t in ('A_eq','A_ub') for c,v in self.compiled[t].items() if c[1] == k and v.index._nA])
+		return unionIndex(ite) if ite else None
+
 	# Infer global index from compiled parameters
 	def inferGlobalDomains(self):
+		if self.compileMode == 'codes':
+			return self.inferGlobalDomainsCodes()
 		self.gIndex = {k: fIndex(k, self.variableDomains(k)) for k in self.allvars}
+		self.offsets = ({'v': offsetSlices({k: len(v) for k,v in self.gIndex.items()})} |
+						{t: offsetSlices({k: len(self.compiled[f'b_{t}'][k]) for k in self.allconstr[t]}) for t in ('eq','ub')})
+		self._symbolTable = None
 		self.globalVariableIndex = stackIndex(self.gIndex.values(), names = stdNames('v'))
 		self.globalConstraintIndex = {t: stackIndex([self.compiled[f'b_{t}'][k] for k in self.allconstr[t]], names = stdNames(t)) if self.compiled[f'b_{t}'] else None for t in ('eq','ub')}
 		self.globalMaps = ({'v': pd.Series(range(len(self.globalVariableIndex)), index = self.globalVariableIndex)} | 
 							{t: pd.Series(range(len(self.globalConstraintIndex[t])), index = self.globalConstraintIndex[t]) if self.compiled[f'b_{t}'] else None for t in ('eq','ub')}
 						)
 
+	def inferGlobalDomainsCodes(self):
+		""" Each symbol is assigned a contiguous range of integers; the tuple-based global indices are built lazily. """
+		self.vDomains = {k: self.variableDomains(k) for k in self.allvars}
+		self.offsets = ({'v': offsetSlices({k: lenIndex(v) for k,v in self.vDomains.items()})} |
+						{t: offsetSlices({k: lenIndex(pyDbs.getIndex(self.compiled[f'b_{t}'][k])) for k in self.allconstr[t]}) for t in ('eq','ub')})
+		self.globalVariableIndex, self.globalConstraintIndex, self.globalMaps, self._symbolTable = None, None, None, None
+
+	@property
+	def globalVariableIndex(self):
+		if self._globalVariableIndex is None and self.compileMode == 'codes':
+			self._globalVariableIndex = stackIndex([fIndex(k, self.vDomains[k]) for k in self.allvars], names = stdNames('v'))
+		return self._globalVariableIndex
+	@globalVariableIndex.setter
+	def globalVariableIndex(self, value):
+		self._globalVariableIndex = value
+	@property
+	def globalConstraintIndex(self):
+		if self._globalConstraintIndex is None and self.compileMode == 'codes':
+			self._globalConstraintIndex = {t: stackIndex([fIndex(k, pyDbs.getIndex(self.compiled[f'b_{t}'][k]), btype = t) for k in self.allconstr[t]], names = stdNames(t)) if self.compiled[f'b_{t}'] else None for t in ('eq','ub')}
+		return self._globalConstraintIndex
+	@globalConstraintIndex.setter
+	def globalConstraintIndex(self, value):
+		self._globalConstraintIndex = value
+	@property
+	def globalMaps(self):
+		if self._globalMaps is None and self.compileMode == 'codes':
+			self._globalMaps = ({'v': pd.Series(range(len(self.globalVariableIndex)), index = self.globalVariableIndex)} | 
+								{t: pd.Series(range(len(self.globalConstraintIndex[t])), index = self.globalConstraintIndex[t]) if self.compiled[f'b_{t}'] else None for t in ('eq','ub')})
+		return self._globalMaps
+	@globalMaps.setter
+	def globalMaps(self, value):
+		self._globalMaps = value
+
 	def getDenseArgs(self):
 		""" NOTE: Vectors are broadcasted """
+		self._lpCache = {}
+		if self.compileMode == 'codes':
+			return self.getDenseArgsCodes()
 		[self.denseArgs.__setitem__(t, stackSeries([self.broadcastAndSort_i(t,k,defaultValue=0) for k in self.allvars], names = stdNames('v'))) for t in ('c','l')];
 		[self.denseArgs.__setitem__('u', stackSeries([self.broadcastAndSort_i('u',k,defaultValue=None) for k in self.allvars], names = stdNames('v')))];
 		[self.denseArgs.__setitem__(f'b_{t}', stackSeries([self.compiled[f'b_{t}'][k] for k in self.allconstr[t]], names = stdNames(t)) if self.allconstr[t] else None) for t in ('eq','ub')];
@@ -139,39 +241,141 @@ class lpBlock:
 	def broadcastAndSort_i(self, t, k, defaultValue = 0):
 		return adjMultiIndex.bc(self.compiled[t][k] if k in self.compiled[t] else defaultValue, self.gIndex[k], fill_value = defaultValue).sort_index()
 
+	# Integer-coded versions of the dense arguments:
+	def getDenseArgsCodes(self):
+		self.cooSlices, self.cooKeep = {}, {'eq': {}, 'ub': {}}
+		[self.denseArgs.__setitem__(t, np.hstack([self.denseVector_i(t, k, defaultValue = d) for k in self.allvars])) for t,d in (('c',0),('l',0),('u',np.nan))];
+		[self.denseArgs.__setitem__(f'b_{t}', np.hstack([np.asarray(self.compiled[f'b_{t}'][k], dtype = np.float64).ravel() for k in self.allconstr[t]]) if self.allconstr[t] else None) for t in ('eq','ub')];
+		[self.denseArgs.__setitem__(f'A_{t}', self.getCooA(t) if self.allconstr[t] else None) for t in ('eq','ub')];
+
+	def denseVector_i(self, t, k, defaultValue = 0):
+		""" Vector of length of the domain of variable k; missing values are filled with defaultValue """
+		out, v = np.full(lenIndex(self.vDomains[k]), np.nan), self.compiled[t].get(k, defaultValue)
+		if isinstance(v, pd.Series):
+			out[codePositions(v.index, self.vDomains[k]) if self.vDomains[k] is not None else 0] = v.values
+		else:
+			out[:] = noneInit(v, np.nan)
+		return out if np.isnan(defaultValue) else np.where(np.isnan(out), defaultValue, out)
+
+	def getCooA(self, t):
+		keys = [(constr,var) for var in self.allvars for constr in self.allconstr[t] if (constr,var) in self.compiled[f'A_{t}']]
+		blocks = [self.cooBlock(t, constr, var) for constr,var in keys]
+		self.cooSlices[t] = offsetSlices({k: len(b[0]) for k,b in zip(keys, blocks)})
+		data, rows, cols = (np.hstack(x) for x in zip(*blocks)) if blocks else (np.empty(0), np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64))
+		return sparse.coo_matrix((data, (rows, cols)), shape = (self.offsets[t][self.allconstr[t][-1]].stop, self.offsets['v'][self.allvars[-1]].stop))
+
+	def cooBlock(self, t, constr, var):
+		""" Values, rows, and columns of the coefficients on 'var' in constraint 'constr' """
+		A = self.compiled[f'A_{t}'][(constr, var)]
+		rows = self.offsets[t][constr].start + A.index._rows
+		cols = self.offsets['v'][var].start + (codePositions(subIndex(A.index, A.index._nA), self.vDomains[var]) if A.index._nA else np.zeros(len(A), dtype = np.int64))
+		keep = (rows >= self.offsets[t][constr].start) & (cols >= self.offsets['v'][var].start)
+		self.cooKeep[t][(constr, var)] = keep
+		if not keep.all():
+			print(f"""Warning: The coefficient matrix 'A_{t}' for constraint '{constr}' and variable '{var}' includes indices that are not in the domains of the constraint or variable. 
+	This is likely due to missing domains either in the relevant 'b_{t}' vector or the 'A_{t}'. """)
+		return A.values.astype(np.float64)[keep], rows[keep], cols[keep]
+
 
 	# 5: Methods to get the stacked numpy arrays:
 	def __call__(self, execute=None):
-		[getattr(self, k)() for k in noneInit(execute, ['compileParameters','settingsFromCompiled','inferGlobalDomains','getDenseArgs'])];
+		if execute is None and self.incremental and self.template and self.compileMode == 'codes' and self.runPhase('updateCompiled'):
+			return self.lp_args
+		[self.runPhase(k) for k in noneInit(execute, ['compileParameters','settingsFromCompiled','inferGlobalDomains','getDenseArgs'])];
+		self.changed, self.template = set(), self.compileMode == 'codes'
 		return self.lp_args
 
+	def runPhase(self, k):
+		with self.log(k):
+			return getattr(self, k)()
+
+	@property
+	def problemSize(self):
+		nnz = lambda t: 0 if self.denseArgs[f'A_{t}'] is None else (len(self.denseArgs[f'A_{t}']) if isinstance(self.denseArgs[f'A_{t}'], pd.Series) else self.denseArgs[f'A_{t}'].nnz)
+		return {'nVars': len(self.lp_c), 'nEq': len(npValues(self.denseArgs['b_eq'])) if self.allconstr['eq'] else 0, 'nUb': len(npValues(self.denseArgs['b_ub'])) if self.allconstr['ub'] else 0, 'nnz': nnz('eq')+nnz('ub')}
+
+	# 6: Incremental updates (compileMode = 'codes'):
+	def updateCompiled(self):
+		""" Recompile symbols affected by changed parameters. If the sparsity pattern is unchanged, the dense arguments are patched
+			in place and True is returned; otherwise nothing is changed and False is returned (calling for a full compilation). """
+		updates = {(t, k): self.recompile(t, k) for t,k in set(self.changedSymbol(t, key) for t,key in self.changed)}
+		if not all(samePattern(self.compiled[t].get(k), v) for (t,k),v in updates.items()):
+			return False
+		[self.compiled[t].__setitem__(k, v) for (t,k),v in updates.items()];
+		[self.patchDenseArgs(t, k) for t,k in updates];
+		self.refreshLpCache()
+		self.changed = set()
+		return True
+
+	def changedSymbol(self, t, key):
+		return (t, key[0:2]) if t.startswith('A_') else (t, key if t.startswith('b_') else key[0])
+
+	def recompile(self, t, k):
+		if t in ('c','l','u'):
+			return self.indexVariable(k, {'c': sumIte, 'l': maxIte, 'u': minIte}[t]([v for key,v in self.parameters[t].items() if key[0] == k]))
+		elif t.startswith('b_'):
+			return self.indexVariable(k, self.parameters[t][k], btype = t[2:])
+		else:
+			compiled = {}
+			self.compileMatrix(t[2:], *k, compiled = compiled)
+			return compiled[k]
+
+	def patchDenseArgs(self, t, k):
+		if t in ('c','l','u'):
+			self.denseArgs[t][self.offsets['v'][k]] = self.denseVector_i(t, k, defaultValue = np.nan if t == 'u' else 0)
+		elif t.startswith('b_'):
+			self.denseArgs[t][self.offsets[t[2:]][k]] = np.asarray(self.compiled[t][k], dtype = np.float64).ravel()
+		else:
+			self.denseArgs[t].data[self.cooSlices[t[2:]][k]] = self.compiled[t][k].values.astype(np.float64)[self.cooKeep[t[2:]][k]]
+
+	# 7: Assembled arguments are cached until the next compilation:
+	def lpCached(self, k, f):
+		if k not in self._lpCache:
+			self._lpCache[k] = f()
+		return self._lpCache[k]
+
+	def refreshLpCache(self):
+		""" After patching values of dense arguments: The CSC matrices are updated in place by permuting the patched COO values """
+		[self._lpCache.pop(k, None) for k in ('bounds',)];
+		[self._lpCache.pop(f'A_{t}', None) for t in ('eq','ub') if self._lpCache.get(f'order_{t}', None) is None];
+		[setattr(self._lpCache[f'A_{t}'], 'data', self.denseArgs[f'A_{t}'].data[self._lpCache[f'order_{t}']]) for t in ('eq','ub') if f'A_{t}' in self._lpCache];
+
+	def assembleA(self, t):
+		""" Assemble constraint matrix in CSC format """
+		if self.compileMode == 'codes':
+			data, rows, cols = self.denseArgs[f'A_{t}'].data, self.denseArgs[f'A_{t}'].row, self.denseArgs[f'A_{t}'].col
+		else:
+			data, rows, cols = self.denseArgs[f'A_{t}'].values, self.rowIndexFromA(self.denseArgs[f'A_{t}'],t).values.astype(np.int64), self.columnIndexFromA(self.denseArgs[f'A_{t}'],t).values.astype(np.int64)
+		A, self._lpCache[f'order_{t}'] = cscFromCoo(np.asarray(data, dtype = np.float64), rows, cols, (self.offsets[t][self.allconstr[t][-1]].stop, self.offsets['v'][self.allvars[-1]].stop))
+		return A
+
 	@property
 	def lp_args(self):
 		return {k: getattr(self, 'lp_'+k) for k in _stdLinProg}
 	@property
 	def lp_c(self):
-		return self.denseArgs['c'].values
+		return npValues(self.denseArgs['c'])
 	@property
 	def lp_l(self): 
-		return self.denseArgs['l'].values
+		return npValues(self.denseArgs['l'])
 	@property
 	def lp_u(self): 
-		return self.denseArgs['u'].values
+		return npValues(self.denseArgs['u'])
 	@property
 	def lp_bounds(self):
-		return np.vstack([self.lp_l, self.lp_u]).T
+		return self.lpCached('bounds', lambda: np.vstack([self.lp_l, self.lp_u]).T)
 	@property
 	def lp_A_eq(self):
-		return sparse.coo_matrix((self.denseArgs['A_eq'].values, (self.rowIndexFromA(self.denseArgs['A_eq'],'eq'), self.columnIndexFromA(self.denseArgs['A_eq'],'eq'))), shape = (len(self.globalConstraintIndex['eq']), len(self.globalVariableIndex))) if self.allconstr['eq'] else None
+		return self.lpCached('A_eq', lambda: self.assembleA('eq')) if self.allconstr['eq'] else None
 	@property
 	def lp_A_ub(self):
-		return sparse.coo_matrix((self.denseArgs['A_ub'].values, (self.rowIndexFromA(self.denseArgs['A_ub'],'ub'), self.columnIndexFromA(self.denseArgs['A_ub'],'ub'))), shape = (len(self.globalConstraintIndex['ub']), len(self.globalVariableIndex))) if self.allconstr['ub'] else None
+		return self.lpCached('A_ub', lambda: self.assembleA('ub')) if self.allconstr['ub'] else None
 	@property
 	def lp_b_eq(self):
-		return self.denseArgs['b_eq'].values if self.allconstr['eq'] else None
+		return npValues(self.denseArgs['b_eq']) if self.allconstr['eq'] else None
 	@property
 	def lp_b_ub(self):
-		return self.denseArgs['b_ub'].values if self.allconstr['ub'] else None
+		return npValues(self.denseArgs['b_ub']) if self.allconstr['ub'] else None
 
 	# CHECKING LOWER/UPPER BOUNDS: Returns index where lower and upper bounds are equal.
 	# In these instances, the solver does not distinguish between the two, and may ascribe the dual variable to either.
@@ -200,3 +404,35 @@ class lpBlock:
 	# Get dual solutions:
 	def dualSolution(self, sol, scalarDual = True):
 		return pd.Series(self.dualValues(sol, scalarDual=scalarDual), index = self.dualIndex)
+
+	def dualBlocks(self, sol, scalarDual = True):
+		if scalarDual:
+			return {'eq': sol['eqlin']['marginals'], 'ub': sol['ineqlin']['marginals'], 'l': self.scalarDualLower(sol), 'u': self.scalarDualUpper(sol)}
+		else:
+			return {'eq': sol['eqlin']['marginals'], 'ub': sol['ineqlin']['marginals'], 'l': sol['lower']['marginals'], 'u': sol['upper']['marginals']}
+
+	# 8: Unload solutions by slicing; the symbol table is built once per compilation:
+	@property
+	def symbolTable(self):
+		""" Table of (symbol, btype, start, stop, index) for variables (btype 'v', also used for the l/u bounds) and constraints (btype 'eq'/'ub'). 
+			'start' and 'stop' are positions in the solution vector of the relevant btype; 'index' is the original index of the symbol (None for scalars). """
+		if self._symbolTable is None:
+			self._symbolTable = pd.DataFrame([(k, t, s.start, s.stop, self.symbolIndex(t, k)) for t in ('v','eq','ub') for k,s in self.offsets[t].items()], 
+											columns = ['symbol','btype','start','stop','index'])
+		return self._symbolTable
+
+	def symbolIndex(self, t, k):
+		if self.compileMode == 'codes':
+			return self.vDomains[k] if t == 'v' else pyDbs.getIndex(self.compiled[f'b_{t}'][k])
+		elif t == 'v':
+			return vIndex(self.gIndex[k].get_level_values(1), self.alldomains[k]) if self.alldomains[k] else None
+		else:
+			return vIndex(self.compiled[f'b_{t}'][k].index.get_level_values(1), self.allconstrdomains[k]) if self.allconstrdomains[k] else None
+
+	def unloadPrimal(self, x):
+		return {r.symbol: unloadSlice(x[r.start:r.stop], r.index) for r in self.symbolTable.itertuples() if r.btype == 'v'}
+
+	def unloadDual(self, sol, scalarDual = True):
+		duals = self.dualBlocks(sol, scalarDual = scalarDual)
+		return ({'λ_'+r.symbol: dualSlice([duals[r.btype][r.start:r.stop]], r.index, [r.btype]) for r in self.symbolTable.itertuples() if r.btype != 'v'} | 
+				{'λ_'+r.symbol: dualSlice([duals['l'][r.start:r.stop], duals['u'][r.start:r.stop]], r.index, ['l','u']) for r in self.symbolTable.itertuples() if r.btype == 'v'})
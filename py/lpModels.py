@@ -1,67 +1,562 @@
 from base import *
 from scipy import optimize
-import itertools
+import itertools, time, functools, os
 import lpCompiler
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csgraph
 
 def loopxs(x, l, loopName):
     return x.xs(l, level=loopName) if isinstance(x.index, pd.MultiIndex) else x[l]
 
 def updateFromGrids(db, grids, loop, l):
-    [db.addOrMerge(g.name, loopxs(g, l, loop.name), priority='second')
-     for g in grids]
+    updateFromDeltas(db, gridDeltas(grids, loop, l))
+
+def gridDeltas(grids, loop, l):
+	""" Parameter values in grids at loop point l """
+	return {g.name: loopxs(g, l, loop.name) for g in grids}
+
+def updateFromDeltas(db, deltas):
+	[db.addOrMerge(k, v, priority='second') for k,v in deltas.items()];
+
+# Parallel sweeps: Each worker process holds a copy of the model (incl. compiled blocks) and solves the grid points it is sent.
+_sweepModel = None
+def _initSweep(model):
+	global _sweepModel
+	_sweepModel = model
+
+def _solveSweep(deltas, extract, kwargs):
+	updateFromDeltas(_sweepModel.db, deltas)
+	return _sweepModel.solveExtract(extract, **kwargs), _sweepModel.solveStats
+
+class highsBackend:
+	""" Persistent HiGHS model (requires highspy). Called with the same arguments as optimize.linprog and returns a solution in the same format. 
+		If the sparsity pattern of the constraint matrix is unchanged since the last call, only the changed costs, bounds, right-hand sides, and 
+		coefficients are passed to HiGHS, which then warm-starts from the previous basis. """
+	def __init__(self, options = None):
+		self.options = noneInit(options, {'output_flag': False})
+		self.highs, self.A = None, None
+
+	def __getstate__(self):
+		return self.__dict__ | {'highs': None, 'A': None}
+
+	def __call__(self, c = None, A_ub = None, b_ub = None, A_eq = None, b_eq = None, bounds = None, options = None, **kwargs):
+		A = sparse.vstack([x for x in (A_ub, A_eq) if x is not None], format = 'csc') if (A_ub is not None or A_eq is not None) else sparse.csc_matrix((0, len(c)))
+		A.sort_indices()
+		nub, b_ub, b_eq = 0 if b_ub is None else len(b_ub), np.empty(0) if b_ub is None else b_ub, np.empty(0) if b_eq is None else b_eq
+		lhs, rhs = np.hstack([np.full(nub, -np.inf), b_eq]), np.hstack([b_ub, b_eq])
+		l, u = np.where(np.isnan(bounds[:,0]), -np.inf, bounds[:,0]), np.where(np.isnan(bounds[:,1]), np.inf, bounds[:,1])
+		warm = self.updateModel(np.asarray(c, dtype = np.float64), A, lhs, rhs, l, u, options = options)
+		t = time.perf_counter()
+		self.highs.run()
+		return self.solution(nub, time.perf_counter()-t, warm)
+
+	def updateModel(self, c, A, lhs, rhs, l, u, options = None):
+		""" Returns True if the existing model is updated (warm start), False if a new model is passed """
+		import highspy
+		warm = self.highs is not None and self.A.shape == A.shape and np.array_equal(self.A.indptr, A.indptr) and np.array_equal(self.A.indices, A.indices)
+		if warm:
+			cols, rows = np.arange(A.shape[1], dtype = np.int32), np.arange(A.shape[0], dtype = np.int32)
+			self.highs.changeColsCost(len(cols), cols, c)
+			self.highs.changeColsBounds(len(cols), cols, l, u)
+			self.highs.changeRowsBounds(len(rows), rows, lhs, rhs)
+			changed = np.flatnonzero(self.A.data != A.data)
+			[self.highs.changeCoeff(int(r), int(j), float(v)) for r,j,v in zip(A.indices[changed], np.repeat(cols, np.diff(A.indptr))[changed], A.data[changed])];
+		else:
+			self.highs = highspy.Highs()
+			[self.highs.setOptionValue(k, v) for k,v in (self.options | noneInit(options, {})).items()];
+			lp = highspy.HighsLp()
+			lp.num_col_, lp.num_row_ = A.shape[1], A.shape[0]
+			lp.col_cost_, lp.col_lower_, lp.col_upper_, lp.row_lower_, lp.row_upper_ = c, l, u, lhs, rhs
+			lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+			lp.a_matrix_.start_, lp.a_matrix_.index_, lp.a_matrix_.value_ = A.indptr, A.indices, A.data
+			self.highs.passModel(lp)
+		self.A = A
+		return warm
+
+	def solution(self, nub, solveTime, warm):
+		import highspy
+		status, info = self.highs.getModelStatus(), self.highs.getInfo()
+		sol = self.highs.getSolution()
+		x, rowDual, colDual = np.array(sol.col_value), np.array(sol.row_dual), np.array(sol.col_dual)
+		colStatus = np.array([int(k) for k in self.highs.getBasis().col_status])
+		return optimize.OptimizeResult({'x': x, 'fun': info.objective_function_value, 'nit': info.simplex_iteration_count, 'time': solveTime, 'warm': warm,
+										'status': {highspy.HighsModelStatus.kOptimal: 0, highspy.HighsModelStatus.kIterationLimit: 1, highspy.HighsModelStatus.kInfeasible: 2, highspy.HighsModelStatus.kUnbounded: 3}.get(status, 4),
+										'message': self.highs.modelStatusToString(status),
+										'ineqlin': {'marginals': rowDual[:nub]}, 'eqlin': {'marginals': rowDual[nub:]},
+										'lower': {'marginals': np.where(colStatus == int(highspy.HighsBasisStatus.kLower), colDual, 0)},
+										'upper': {'marginals': np.where(colStatus == int(highspy.HighsBasisStatus.kUpper), colDual, 0)}})
+
+class meritOrderBackend:
+	""" Solves LPs where every variable enters exactly one equality constraint and there are no inequality constraints (e.g. hourly economic 
+		dispatch), by clearing each constraint in merit order: Variables are sorted on their unit cost c/a of the right-hand side, and the residual 
+		(right-hand side net of the variables at their lower bounds) is filled from the cheapest variable. The dual of the constraint is the unit 
+		cost of the marginal variable (if the residual is exactly filled by a variable, this variable is marginal; the dual is not unique in this 
+		case). Other LPs are solved by optimize.linprog(method = fallback). Called with the same arguments as 
+		optimize.linprog and returns a solution in the same format. """
+	def __init__(self, fallback = 'highs', tol = 1e-9):
+		self.fallback, self.tol = fallback, tol
+
+	def __call__(self, c = None, A_ub = None, b_ub = None, A_eq = None, b_eq = None, bounds = None, options = None, **kwargs):
+		A = None if A_eq is None else sparse.csc_matrix(A_eq, copy = True)
+		if A is not None:
+			A.sum_duplicates()
+			A.eliminate_zeros()
+		bounds = np.asarray(bounds, dtype = np.float64)
+		l, u = np.where(np.isnan(bounds[:,0]), -np.inf, bounds[:,0]), np.where(np.isnan(bounds[:,1]), np.inf, bounds[:,1])
+		if not self.applies(A, A_ub, l, u):
+			return optimize.linprog(method = self.fallback, c = c, A_ub = A_ub, b_ub = b_ub, A_eq = A_eq, b_eq = b_eq, bounds = bounds, options = options, **kwargs)
+		t = time.perf_counter()
+		sol = self.clear(np.asarray(c, dtype = np.float64), A, np.asarray(b_eq, dtype = np.float64), l, u)
+		sol['time'] = time.perf_counter()-t
+		return sol
+
+	@staticmethod
+	def applies(A, A_ub, l, u):
+		return (A is not None and (A_ub is None or A_ub.shape[0] == 0) and (np.diff(A.indptr) == 1).all() and np.isfinite(l).all() and np.isfinite(u).all())
+
+	def clear(self, c, A, b, l, u):
+		rows, a = A.indices, A.data
+		p, ylo, cap = c/a, np.minimum(a*l, a*u), np.abs(a*(u-l))
+		residual = b-np.bincount(rows, weights = ylo, minlength = A.shape[0])
+		tol = self.tol*max(1, np.abs(b).max(initial = 0))
+		order = np.lexsort((p, rows))
+		total = np.bincount(rows, weights = cap, minlength = A.shape[0])
+		before = np.cumsum(cap[order])-cap[order]-np.repeat(np.cumsum(total)-total, np.bincount(rows, minlength = A.shape[0]))
+		fill = np.empty(len(c))
+		fill[order] = np.clip(residual[rows[order]]-before, 0, cap[order])
+		x = np.where(a>0, l, u)+fill/a
+		marginal = order[before+cap[order] >= residual[rows[order]]-tol]
+		rowsMarginal, first = np.unique(rows[marginal], return_index = True)
+		λ = np.zeros(A.shape[0])
+		λ[rowsMarginal] = p[marginal[first]]
+		d = c-a*λ[rows]
+		feasible = ((residual >= -tol) & (residual <= total+tol)).all()
+		return optimize.OptimizeResult({'x': x, 'fun': c @ x, 'nit': 0, 'status': 0 if feasible else 2, 'success': feasible, 
+										'message': 'Cleared in merit order' if feasible else 'The problem is infeasible',
+										'eqlin': {'marginals': λ, 'residual': np.zeros(A.shape[0])}, 'ineqlin': {'marginals': np.empty(0), 'residual': np.empty(0)},
+										'lower': {'marginals': np.where(d>0, d, 0)}, 'upper': {'marginals': np.where(d<0, d, 0)}})
+
+class presolveBackend:
+	""" Removes fixed columns (l == u) and columns that are not in any constraint (fixed at their optimal bound), empty rows, and singleton rows
+		(singleton equalities fix the column; singleton inequalities tighten its bounds) before calling solver (default: optimize.linprog(method = method)).
+		Reductions are repeated until no more apply. The solution is expanded to the original dimensions: Removed rows get the dual that makes the 
+		reduced costs of their column consistent, and the reduced costs of removed columns are their bound duals. """
+	def __init__(self, solver = None, method = 'highs', tol = 1e-9):
+		self.solver = noneInit(solver, functools.partial(optimize.linprog, method = method))
+		self.tol = tol
+
+	def __call__(self, c = None, A_ub = None, b_ub = None, A_eq = None, b_eq = None, bounds = None, options = None, **kwargs):
+		c, bounds = np.asarray(c, dtype = np.float64), np.asarray(bounds, dtype = np.float64)
+		A = {t: sparse.csc_matrix(x) if x is not None else sparse.csc_matrix((0, len(c))) for t,x in (('eq', A_eq), ('ub', A_ub))}
+		b = {'eq': np.empty(0) if b_eq is None else np.asarray(b_eq, dtype = np.float64), 'ub': np.empty(0) if b_ub is None else np.asarray(b_ub, dtype = np.float64)}
+		p = self.presolve(c, A, b, bounds)
+		if p['status'] != 0:
+			return optimize.OptimizeResult({'x': None, 'fun': None, 'status': p['status'], 'success': False, 'message': p['message'], 'nit': 0, 'presolve': p['stats']})
+		cols, rows = p['cols'], p['rows']
+		if cols.any():
+			Ar = {t: A[t][rows[t]][:, cols] for t in A}
+			sol = self.solver(c = c[cols], A_ub = Ar['ub'] if rows['ub'].any() else None, b_ub = p['b']['ub'][rows['ub']] if rows['ub'].any() else None,
+							  A_eq = Ar['eq'] if rows['eq'].any() else None, b_eq = p['b']['eq'][rows['eq']] if rows['eq'].any() else None,
+							  bounds = np.column_stack([p['l'][cols], p['u'][cols]]), options = options, **kwargs)
+		else:
+			sol = optimize.OptimizeResult({'x': np.empty(0), 'fun': 0, 'status': 0, 'message': 'Solved in presolve', 'nit': 0, 'eqlin': {'marginals': np.empty(0)}, 
+										   'ineqlin': {'marginals': np.empty(0)}, 'lower': {'marginals': np.empty(0)}, 'upper': {'marginals': np.empty(0)}})
+		if sol['status'] != 0:
+			return sol | {'presolve': p['stats']}
+		return self.postsolve(sol, c, A, b, p)
+
+	def presolve(self, c, A, b, bounds):
+		""" Returns the remaining columns and rows, the modified bounds and right-hand sides, the fixed values, and the stack of reductions """
+		n, tol = len(c), self.tol
+		l, u, x = np.where(np.isnan(bounds[:,0]), -np.inf, bounds[:,0]), np.where(np.isnan(bounds[:,1]), np.inf, bounds[:,1]), np.zeros(n)
+		b = {t: b[t].copy() for t in b}
+		cols, rows = np.ones(n, dtype = bool), {t: np.ones(A[t].shape[0], dtype = bool) for t in A}
+		boundRow = {'l': np.full(n, -1), 'u': np.full(n, -1)}
+		ops, const = [], 0
+		infeasible = lambda msg: {'status': 2, 'message': f'The problem is infeasible ({msg})', 'stats': {}}
+		while True:
+			changed = False
+			fixed = cols & (l == u) & np.isfinite(l)
+			if fixed.any():
+				ix = np.flatnonzero(fixed)
+				x[ix], const = l[ix], const+c[ix] @ l[ix]
+				[b.__setitem__(t, b[t]-A[t][:, ix] @ l[ix]) for t in A];
+				cols[ix], changed = False, True
+				ops.append(('fix', ix))
+			active = np.flatnonzero(cols)
+			for t in A:
+				r = np.flatnonzero(rows[t])
+				S = A[t][r][:, active].tocsr()
+				S.eliminate_zeros()
+				count = np.diff(S.indptr)
+				empty = r[count == 0]
+				if (np.abs(b[t][empty]) > tol*np.maximum(1, np.abs(b[t][empty]))).any() if t == 'eq' else (b[t][empty] < -tol*np.maximum(1, np.abs(b[t][empty]))).any():
+					return infeasible(f'empty {t} constraint')
+				rows[t][empty] = False
+				pos = np.flatnonzero(count == 1)
+				if not len(pos):
+					changed |= len(empty) > 0
+					continue
+				i, j, a = r[pos], active[S.indices[S.indptr[pos]]], S.data[S.indptr[pos]]
+				if t == 'eq':
+					j, first = np.unique(j, return_index = True)
+					i, a, v = i[first], a[first], b[t][i[first]]/a[first]
+					if ((v < l[j]-tol*np.maximum(1, np.abs(v))) | (v > u[j]+tol*np.maximum(1, np.abs(v)))).any():
+						return infeasible('singleton equality outside bounds')
+					l[j] = u[j] = np.clip(v, l[j], u[j])
+					rows[t][i] = False
+					ops.append(('eqSingleton', i, j, a))
+				else:
+					rows[t][i] = False
+					v = b[t][i]/a
+					for side, m, better in (('u', a > 0, np.less), ('l', a < 0, np.greater)):
+						order = np.lexsort((v[m] if side == 'u' else -v[m], j[m]))
+						jm, vm, im, am = j[m][order], v[m][order], i[m][order], a[m][order]
+						jm, first = np.unique(jm, return_index = True)
+						vm, im, am = vm[first], im[first], am[first]
+						tighter = better(vm, (u if side == 'u' else l)[jm])
+						jm, vm, im, am = jm[tighter], vm[tighter], im[tighter], am[tighter]
+						(u if side == 'u' else l)[jm], boundRow[side][jm] = vm, im
+						ops.append(('ubSingleton', side, im, jm, am))
+					crossed = cols & (l > u)
+					if (l[crossed]-u[crossed] > tol*np.maximum(1, np.abs(l[crossed]))).any():
+						return infeasible('singleton inequalities cross the bounds')
+					u[crossed] = l[crossed]
+				changed = True
+			colCount = sum(np.diff((A[t][rows[t]][:, active] != 0).tocsc().indptr) for t in A) if any(rows[t].any() for t in A) else np.zeros(len(active), dtype = int)
+			emptyCols = active[colCount == 0]
+			if len(emptyCols):
+				v = np.where(c[emptyCols] > 0, l[emptyCols], np.where(c[emptyCols] < 0, u[emptyCols], np.where(np.isfinite(l[emptyCols]), l[emptyCols], np.where(np.isfinite(u[emptyCols]), u[emptyCols], 0))))
+				if not np.isfinite(v).all():
+					return {'status': 3, 'message': 'The problem is unbounded (a variable without constraints is unbounded in the direction that improves the objective)', 'stats': {}}
+				l[emptyCols] = u[emptyCols] = v
+				changed = True
+			if not changed:
+				break
+		stats = {'cols': int(n-cols.sum()), 'rows_eq': int(len(rows['eq'])-rows['eq'].sum()), 'rows_ub': int(len(rows['ub'])-rows['ub'].sum())}
+		return {'status': 0, 'cols': cols, 'rows': rows, 'l': l, 'u': u, 'b': b, 'x': x, 'const': const, 'ops': ops, 'boundRow': boundRow, 'stats': stats}
+
+	def postsolve(self, sol, c, A, b, p):
+		x, cols, rows = p['x'], p['cols'], p['rows']
+		x[cols] = sol['x']
+		y = {t: np.zeros(len(b[t])) for t in b}
+		[y[t].__setitem__(rows[t], sol[l]['marginals']) for t,l in (('eq','eqlin'), ('ub','ineqlin')) if rows[t].any()];
+		z = {'l': np.zeros(len(c)), 'u': np.zeros(len(c))}
+		z['l'][cols], z['u'][cols] = sol['lower']['marginals'], sol['upper']['marginals']
+		for op in reversed(p['ops']):
+			if op[0] == 'fix':
+				d = c[op[1]]-A['eq'][:, op[1]].T @ y['eq']-A['ub'][:, op[1]].T @ y['ub']
+				z['l'][op[1]], z['u'][op[1]] = np.maximum(d, 0), np.minimum(d, 0)
+			elif op[0] == 'eqSingleton':
+				_, i, j, a = op
+				y['eq'][i] = (z['l'][j]+z['u'][j])/a
+				z['l'][j] = z['u'][j] = 0
+			else:
+				_, side, i, j, a = op
+				final = p['boundRow'][side][j] == i
+				y['ub'][i[final]] = z[side][j[final]]/a[final]
+				z[side][j[final]] = 0
+		return optimize.OptimizeResult(dict(sol) | {'x': x, 'fun': sol['fun']+p['const'], 'presolve': p['stats'], 'eqlin': {'marginals': y['eq']}, 'ineqlin': {'marginals': y['ub']},
+												   'lower': {'marginals': z['l']}, 'upper': {'marginals': z['u']}})
+
+def _solveSubproblem(solver, args):
+	return solver(**args)
+
+class decompositionBackend:
+	""" Splits the LP into independent subproblems: The connected components of the graph that links each constraint (in A_eq and A_ub) to 
+		the variables it includes. Components are grouped into batches of contiguous components of similar size, and the batches are solved in a 
+		process pool with max_workers processes (in this process if max_workers = 1). solver is called with the same arguments as 
+		optimize.linprog (default: optimize.linprog(method = method)). The partial solutions are stitched into a single solution in the same format. """
+	def __init__(self, solver = None, method = 'highs', max_workers = None, batches = None):
+		self.solver = noneInit(solver, functools.partial(optimize.linprog, method = method))
+		self.max_workers, self.batches = max_workers, batches
+		self.executor = None
+
+	def __getstate__(self):
+		return self.__dict__ | {'executor': None}
+
+	def __call__(self, c = None, A_ub = None, b_ub = None, A_eq = None, b_eq = None, bounds = None, options = None, **kwargs):
+		A = {t: sparse.csr_matrix(x) if x is not None else sparse.csr_matrix((0, len(c))) for t,x in (('eq', A_eq), ('ub', A_ub))}
+		b = {'eq': np.empty(0) if b_eq is None else np.asarray(b_eq, dtype = np.float64), 'ub': np.empty(0) if b_ub is None else np.asarray(b_ub, dtype = np.float64)}
+		rowBatch, colBatch, nComponents = self.batchLabels(sparse.vstack([A['eq'], A['ub']], format = 'csr'))
+		rowBatch = {'eq': rowBatch[:A['eq'].shape[0]], 'ub': rowBatch[A['eq'].shape[0]:]}
+		subs = [self.subproblem(np.asarray(c, dtype = np.float64), A, b, bounds, colBatch == k, {t: rowBatch[t] == k for t in A}, options, kwargs) for k in range(colBatch.max(initial = -1)+1)]
+		t = time.perf_counter()
+		sols = list(self.pool().map(_solveSubproblem, itertools.repeat(self.solver), subs)) if self.parallel(len(subs)) else [self.solver(**x) for x in subs]
+		return self.stitch(sols, colBatch, rowBatch, b, len(c), nComponents, time.perf_counter()-t)
+
+	def parallel(self, n):
+		return n > 1 and self.max_workers != 1
+
+	def pool(self):
+		if self.executor is None:
+			self.executor = ProcessPoolExecutor(max_workers = self.max_workers)
+		return self.executor
+
+	def batchLabels(self, A):
+		""" Batch of each row (-1 for empty rows) and column of A, and the number of components """
+		m, n = A.shape
+		nComponents, labels = csgraph.connected_components(sparse.bmat([[None, A], [A.T, None]], format = 'csr') if m else sparse.csr_matrix((n, n)), directed = False)
+		rowLabels, colLabels = (labels[:m], labels[m:]) if m else (np.empty(0, dtype = np.int64), labels)
+		components, colLabels = np.unique(colLabels, return_inverse = True)
+		rowLabels = np.where(np.isin(rowLabels, components), np.searchsorted(components, rowLabels), -1)
+		size = np.bincount(colLabels, minlength = len(components))+np.bincount(rowLabels[rowLabels >= 0], minlength = len(components))
+		nBatches = min(len(components), noneInit(self.batches, 4*(os.cpu_count() or 1) if self.max_workers is None else 4*self.max_workers))
+		batch = np.minimum((nBatches*(np.cumsum(size)-size)/size.sum()).astype(np.int64), nBatches-1)
+		batch = np.unique(batch, return_inverse = True)[1].ravel()
+		return np.where(rowLabels >= 0, batch[rowLabels], -1), batch[colLabels], len(components)
+
+	@staticmethod
+	def subproblem(c, A, b, bounds, cols, rows, options, kwargs):
+		sub = {'c': c[cols], 'bounds': np.asarray(bounds)[cols], 'options': options} | kwargs
+		for t in ('eq', 'ub'):
+			sub[f'A_{t}'], sub[f'b_{t}'] = (A[t][rows[t]][:, cols], b[t][rows[t]]) if rows[t].any() else (None, None)
+		return sub
+
+	@staticmethod
+	def stitch(sols, colBatch, rowBatch, b, n, nComponents, solveTime):
+		""" Combine solutions of the batches. Empty constraints have zero duals (and make the problem infeasible if they are violated). """
+		x, lower, upper = np.zeros(n), np.zeros(n), np.zeros(n)
+		duals = {t: np.zeros(len(b[t])) for t in b}
+		for k,sol in enumerate(sols):
+			cols = colBatch == k
+			x[cols], lower[cols], upper[cols] = sol['x'], sol['lower']['marginals'], sol['upper']['marginals']
+			[duals[t].__setitem__(rowBatch[t] == k, sol[l]['marginals']) for t,l in (('eq','eqlin'), ('ub','ineqlin')) if (rowBatch[t] == k).any()];
+		status = next((sol['status'] for sol in sols if sol['status'] != 0), 0)
+		if status == 0 and ((np.abs(b['eq'][rowBatch['eq'] < 0]) > 0).any() or (b['ub'][rowBatch['ub'] < 0] < 0).any()):
+			status = 2
+		return optimize.OptimizeResult({'x': x, 'fun': sum(sol['fun'] for sol in sols if sol['fun'] is not None), 'status': status, 'success': status == 0,
+										'message': next((sol['message'] for sol in sols if sol['status'] == status), 'The problem is infeasible'),
+										'nit': sum(noneInit(sol.get('nit'), 0) for sol in sols), 'time': solveTime, 'components': nComponents, 'batches': len(sols),
+										'eqlin': {'marginals': duals['eq']}, 'ineqlin': {'marginals': duals['ub']}, 'lower': {'marginals': lower}, 'upper': {'marginals': upper}})
+
+# Benders subproblems: Each worker process holds the subproblems and is sent their right-hand sides.
+_bendersSolver, _bendersSubs = None, None
+def _initBenders(solver, subs):
+	global _bendersSolver, _bendersSubs
+	_bendersSolver, _bendersSubs = solver, subs
+
+def _solveBenders(k, b_eq, b_ub):
+	return _bendersSolver(**(_bendersSubs[k] | {'b_eq': b_eq, 'b_ub': b_ub}))
+
+class bendersBackend(decompositionBackend):
+	""" Benders decomposition: The master problem includes the variables in 'master' (e.g. investments) and the constraints that only include these;
+		the remaining constraints and variables are split into batches of independent subproblems as in decompositionBackend (e.g. hourly dispatch). 
+		The subproblems are solved in a process pool given the master solution, and their duals define an optimality cut on the cost of each batch
+		that is added to the master problem. Iterates until the gap between the upper bound (master costs + subproblem costs) and the lower bound 
+		(the master objective) is below tol (relative). The cost of each batch is bounded below by its minimum over the variable bounds (or 
+		lowerBound if this is not finite). Subproblems should be feasible for all master solutions (complete recourse). """
+	def __init__(self, blocks, master, solver = None, method = 'highs', max_workers = None, batches = None, tol = 1e-6, maxIter = 200, lowerBound = None):
+		super().__init__(solver = solver, method = method, max_workers = max_workers, batches = batches)
+		self.blocks, self.master = blocks, master
+		self.tol, self.maxIter, self.lowerBound = tol, maxIter, lowerBound
+
+	def __getstate__(self):
+		return super().__getstate__() | {'blocks': None}
+
+	def masterColumns(self, n):
+		m = np.zeros(n, dtype = bool)
+		[m.__setitem__(slice(r.start, r.stop), True) for r in self.blocks.symbolTable.itertuples() if r.btype == 'v' and r.symbol in self.master];
+		return m
+
+	def __call__(self, c = None, A_ub = None, b_ub = None, A_eq = None, b_eq = None, bounds = None, options = None, **kwargs):
+		c, bounds = np.asarray(c, dtype = np.float64), np.asarray(bounds, dtype = np.float64)
+		A = {t: sparse.csr_matrix(x) if x is not None else sparse.csr_matrix((0, len(c))) for t,x in (('eq', A_eq), ('ub', A_ub))}
+		b = {'eq': np.empty(0) if b_eq is None else np.asarray(b_eq, dtype = np.float64), 'ub': np.empty(0) if b_ub is None else np.asarray(b_ub, dtype = np.float64)}
+		m = self.masterColumns(len(c))
+		rowBatch, colBatch, nComponents = self.batchLabels(sparse.vstack([A['eq'], A['ub']], format = 'csr')[:, ~m])
+		rowBatch = {'eq': rowBatch[:A['eq'].shape[0]], 'ub': rowBatch[A['eq'].shape[0]:]}
+		cols = np.full(len(c), -1)
+		cols[~m] = colBatch
+		K = colBatch.max(initial = -1)+1
+		subs = [self.subproblem(c, A, b, bounds, cols == k, {t: rowBatch[t] == k for t in A}, options, kwargs) for k in range(K)]
+		B = {t: [A[t][rowBatch[t] == k][:, m] for k in range(K)] for t in A}
+		lb = np.array([self.subproblemBound(sub, k) for k,sub in enumerate(subs)])
+		t = time.perf_counter()
+		executor = ProcessPoolExecutor(max_workers = self.max_workers, initializer = _initBenders, initargs = (self.solver, subs)) if self.parallel(K) else None
+		try:
+			sol = self.iterate(c, A, b, bounds, m, rowBatch, subs, B, lb, executor, options)
+		finally:
+			if executor is not None:
+				executor.shutdown()
+		return self.stitchBenders(sol, cols, rowBatch, m, A, b, c, subs, nComponents, time.perf_counter()-t)
+
+	def subproblemBound(self, sub, k):
+		c, l, u = sub['c'], np.where(np.isnan(sub['bounds'][:,0]), -np.inf, sub['bounds'][:,0]), np.where(np.isnan(sub['bounds'][:,1]), np.inf, sub['bounds'][:,1])
+		with np.errstate(invalid = 'ignore'):
+			lb = np.where(c > 0, c*l, np.where(c < 0, c*u, 0)).sum()
+		if np.isfinite(lb):
+			return lb
+		elif self.lowerBound is not None:
+			return self.lowerBound
+		raise ValueError(f"The costs of Benders subproblem {k} are not bounded below by the variable bounds; pass lowerBound.")
+
+	def solveSubproblems(self, subs, B, b_k, x, executor):
+		rhs = [{t: None if B[t][k].shape[0] == 0 else b_k[t][k]-B[t][k] @ x for t in B} for k in range(len(subs))]
+		if executor is None:
+			return [self.solver(**(sub | {'b_eq': r['eq'], 'b_ub': r['ub']})) for sub,r in zip(subs, rhs)]
+		return list(executor.map(_solveBenders, range(len(subs)), [r['eq'] for r in rhs], [r['ub'] for r in rhs]))
+
+	def iterate(self, c, A, b, bounds, m, rowBatch, subs, B, lb, executor, options):
+		""" Returns the last master solution, subproblem solutions, the number of iterations, and the duals of the subproblems that define the cuts """
+		K, n = len(subs), m.sum()
+		masterRows = {t: rowBatch[t] < 0 for t in A}
+		mA = {t: A[t][masterRows[t]][:, m] for t in A}
+		b_k = {t: [b[t][rowBatch[t] == k] for k in range(K)] for t in A}
+		cuts, rhs, duals = [], [], []
+		for i in range(1, self.maxIter+1):
+			A_ub = sparse.vstack([sparse.hstack([mA['ub'], sparse.csr_matrix((mA['ub'].shape[0], K))])]+cuts, format = 'csr')
+			master = self.solver(c = np.hstack([c[m], np.ones(K)]), A_ub = A_ub if A_ub.shape[0] else None, b_ub = np.hstack([b['ub'][masterRows['ub']]]+rhs) if A_ub.shape[0] else None,
+								 A_eq = sparse.hstack([mA['eq'], sparse.csr_matrix((mA['eq'].shape[0], K))], format = 'csr') if mA['eq'].shape[0] else None, 
+								 b_eq = b['eq'][masterRows['eq']] if mA['eq'].shape[0] else None, bounds = np.vstack([bounds[m], np.column_stack([lb, np.full(K, np.inf)])]), options = options)
+			if master['status'] != 0:
+				return master, [], i, duals
+			x = master['x'][:n]
+			sols = self.solveSubproblems(subs, B, b_k, x, executor)
+			if any(sol['status'] != 0 for sol in sols):
+				return master, sols, i, duals
+			f = np.array([sol['fun'] for sol in sols])
+			upper = c[m] @ x + f.sum()
+			if upper-master['fun'] <= self.tol*max(1, abs(upper)):
+				return master, sols, i, duals
+			g = [-(B['eq'][k].T @ sols[k]['eqlin']['marginals'] if B['eq'][k].shape[0] else 0)-(B['ub'][k].T @ sols[k]['ineqlin']['marginals'] if B['ub'][k].shape[0] else 0) for k in range(K)]
+			cuts.append(sparse.hstack([sparse.csr_matrix(np.vstack(g)), -sparse.identity(K)]))
+			rhs.append(np.array([g[k] @ x - f[k] for k in range(K)]))
+			duals.append([{l: sol[l]['marginals'] for l in ('eqlin','ineqlin','lower','upper')} for sol in sols])
+		return optimize.OptimizeResult(master | {'status': 1, 'message': f'Benders decomposition did not converge in {self.maxIter} iterations'}), sols, self.maxIter, duals
+
+	def stitchBenders(self, sol, cols, rowBatch, m, A, b, c, subs, nComponents, solveTime):
+		""" Combine the master and subproblem solutions. Constraints in the master problem get the duals from the master problem. The duals of each
+			batch are the combination of the subproblem duals that define its cuts, weighted by the multipliers of the cuts in the final master 
+			problem (the remaining weight is put on the zero dual of the bound on the batch costs): The active cuts are tight at the final master 
+			solution, such that this is a dual solution of the full LP (up to tol). Duals of the bounds on master variables are their reduced costs. """
+		master, sols, iterations, duals = sol
+		if master['status'] != 0 or any(s['status'] != 0 for s in sols):
+			s = master if master['status'] != 0 else next(s for s in sols if s['status'] != 0)
+			return optimize.OptimizeResult({'x': None, 'fun': None, 'status': s['status'], 'success': False, 'message': s['message'], 'nit': iterations, 'time': solveTime})
+		rows, x, K = {t: rowBatch[t] < 0 for t in rowBatch}, master['x'][:m.sum()], len(subs)
+		res = self.stitch(sols, cols, rowBatch, {t: np.where(rows[t], 0, b[t]) for t in b}, len(m), nComponents, solveTime)
+		w = -master['ineqlin']['marginals'][rows['ub'].sum():].reshape(len(duals), K) if duals else np.zeros((0, K))
+		for k,sub in enumerate(subs):
+			z = sub['c']*(1-w[:,k].sum())
+			lower, upper = np.where(z > 0, z, 0)+sum(w[i,k]*d[k]['lower'] for i,d in enumerate(duals)), np.where(z < 0, z, 0)+sum(w[i,k]*d[k]['upper'] for i,d in enumerate(duals))
+			res['lower']['marginals'][cols == k], res['upper']['marginals'][cols == k] = lower, upper
+			[res[l]['marginals'].__setitem__(rowBatch[t] == k, sum(w[i,k]*d[k][l] for i,d in enumerate(duals))) for t,l in (('eq','eqlin'), ('ub','ineqlin')) if (rowBatch[t] == k).any()];
+		if rows['eq'].any():
+			res['eqlin']['marginals'][rows['eq']] = master['eqlin']['marginals']
+		if rows['ub'].any():
+			res['ineqlin']['marginals'][rows['ub']] = master['ineqlin']['marginals'][:rows['ub'].sum()]
+		d = c[m]-A['eq'][:, m].T @ res['eqlin']['marginals']-A['ub'][:, m].T @ res['ineqlin']['marginals']
+		res.x[m], res['lower']['marginals'][m], res['upper']['marginals'][m] = x, np.where(d > 0, d, 0), np.where(d < 0, d, 0)
+		res.update({'fun': res['fun']+c[m] @ x, 'nit': res['nit']+noneInit(master.get('nit'), 0), 'iterations': iterations})
+		return res
 
 def readSolutionLoop(sol, loop, i, extract, db):
 	return pd.concat(sol[i:len(loop)*len(extract):len(extract)], axis=1).set_axis(loop, axis=1).stack() if isinstance(db[extract[i]], pd.Series) else pd.Series(sol[i:len(loop)*len(extract):len(extract)], index=loop)
 
 class modelShell:
-	def __init__(self, db, blocks=None, method = 'highs', scalarDualAtUpper = True, computeDual = True, standardSolve = None, **kwargs):
+	def __init__(self, db, blocks=None, method = 'highs', scalarDualAtUpper = True, computeDual = True, standardSolve = None, profile = False, trace = False, presolve = False, decompose = False, benders = None, max_workers = None, sparseDomains = False, **kwargs):
+		""" method = 'highspy' solves with a persistent HiGHS model (highsBackend); method = 'meritOrder' clears LPs without coupling constraints (e.g. hourly 
+			dispatch) in merit order (meritOrderBackend); other methods are passed to optimize.linprog. presolve = True removes fixed and empty variables, 
+			empty constraints, and singleton constraints before the solver is called (presolveBackend). decompose = True splits the LP into independent 
+			subproblems that are solved with the chosen method in a pool of max_workers processes (decompositionBackend). benders = list of variables (or 
+			True for self.investmentVariables) solves the LP by Benders decomposition with these variables in the master problem (bendersBackend). 
+			profile = True collects cProfile statistics per phase (self.log.profiles); trace = True records peak memory per phase using tracemalloc. 
+			sparseDomains = True lets models that support it (with the property denseDomains) define variables only where their capacity is non-zero; 
+			the variables are filled with zeros on denseDomains when unloaded. """
 		self.db = db
+		self.sparseDomains = sparseDomains
 		self.method = method
 		self.scalarDualAtUpper = True
 		self.computeDual = computeDual
 		self.blocks = noneInit(blocks, lpCompiler.lpBlock(**kwargs))
+		self.backend = highsBackend() if method == 'highspy' else meritOrderBackend() if method == 'meritOrder' else None
+		if presolve:
+			self.backend = presolveBackend(solver = self.backend, method = method)
+		if decompose:
+			self.backend = decompositionBackend(solver = self.backend, method = method, max_workers = max_workers)
+		if benders:
+			self.backend = bendersBackend(self.blocks, self.investmentVariables if benders is True else benders, solver = self.backend, method = method, max_workers = max_workers)
+		self.log = phaseLog(profile = profile, trace = trace)
+		self.blocks.log = self.log
 		if hasattr(self, 'globalDomains'):
 			self.blocks.globalDomains = self.globalDomains
 
 	def __call__(self, execute = None):
-		[getattr(self, k)(**v) for k,v in noneInit(execute, dict.fromkeys(['preSolve','initBlocks','solve'], {})).items() if hasattr(self,k)];
+		[self.runPhase(k, **v) for k,v in noneInit(execute, dict.fromkeys(['preSolve','initBlocks','solve'], {})).items() if hasattr(self,k)];
+
+	def runPhase(self, k, **kwargs):
+		with self.log(k):
+			return getattr(self, k)(**kwargs)
+
+	@property
+	def timings(self):
+		""" Seconds and calls (and peak memory) per phase along with the dimensions of the latest LP """
+		return self.log.report(size = self.blocks.problemSize if self.blocks.denseArgs['c'] is not None else None)
 
 	def solve(self, printSol = True, solKwargs = None, solOptions=None, postKwargs = None, **kwargs):
-		sol = optimize.linprog(method = self.method, **self.blocks(execute = solKwargs), **noneInit(solOptions, {}))
+		args = self.blocks(execute = solKwargs)
+		t = time.perf_counter()
+		with self.log('solver'):
+			sol = self.backend(**args, **noneInit(solOptions, {})) if self.backend else optimize.linprog(method = self.method, **args, **noneInit(solOptions, {}))
+		self.solveStats = {'status': sol['status'], 'nit': sol.get('nit'), 'time': time.perf_counter()-t, 'warm': sol.get('warm', False)}
 		if printSol:
 			print(f"Solution status {sol['status']}: {sol['message']}")
-		self.postSolve(sol, **noneInit(postKwargs, {}))
+		with self.log('postSolve'):
+			self.postSolve(sol, **noneInit(postKwargs, {}))
 
 	def postSolve(self, solution, **kwargs):
 		if solution['status'] == 0:
 			self.unloadToDb(solution)
 
 	def unloadSolution(self, sol):
-		fullVector = pd.Series(sol['x'], index=self.blocks.globalVariableIndex)
-		return {k: vIndexVariable(fullVector, k, v) for k, v in self.blocks.alldomains.items()}
+		return self.blocks.unloadPrimal(sol['x'])
 
 	def unloadDualSolution(self, sol):
-		fullVector = self.blocks.dualSolution(sol, scalarDual = self.scalarDualAtUpper)
-		return {**self.unloadShadowValuesConstraints(fullVector), **self.unloadShadowValuesBounds(fullVector)}
+		return self.blocks.unloadDual(sol, scalarDual = self.scalarDualAtUpper)
 
-	def unloadShadowValuesBounds(self, fullVector):
-		return {'λ_'+k: vIndexSymbolDual(fullVector, k, v) for k, v in self.blocks.alldomains.items()}
+	def unloadToDb(self, sol):
+		with self.log('unloadToDb'):
+			[self.db.__setitem__(k, v) for k, v in self.fillDomains(self.unloadSolution(sol)).items()]
+			if self.computeDual:
+				[self.db.__setitem__(k,v) for k,v in self.fillDomains(self.unloadDualSolution(sol), dual = True).items()];
 
-	def unloadShadowValuesConstraints(self, fullVector):
-		return {'λ_'+k: vIndexSymbolDual(fullVector, k, v) for k,v in self.blocks.allconstrdomains.items()}
+	def sparseConditions(self, k):
+		""" Conditions that restrict parameters to the domain of variable k with sparseDomains (None otherwise) """
+		return self.globalDomains[k] if self.sparseDomains else None
 
-	def unloadToDb(self, sol):
-		[self.db.__setitem__(k, v) for k, v in self.unloadSolution(sol).items()]
-		if self.computeDual:
-			[self.db.__setitem__(k,v) for k,v in self.unloadDualSolution(sol).items()];
+	def fillDomains(self, symbols, dual = False):
+		""" With sparseDomains, fill variables (or their duals) in self.denseDomains with zeros on the dense domain """
+		if not (self.sparseDomains and hasattr(self, 'denseDomains')):
+			return symbols
+		f, name = (fillZerosDual, lambda k: 'λ_'+k) if dual else (fillZeros, lambda k: k)
+		return symbols | {name(k): f(symbols[name(k)], v) for k,v in self.denseDomains.items() if name(k) in symbols}
 
 	def loopSolveExtract(self, loop, grids, extract, preSolve=None, initBlocks=None, postSolve=None, printSol=False):
 		""" Update exogenous parameters in loop, solve, and extract selected variables """
-		n = list(itertools.chain.from_iterable((self.loopSolveExtract_l(loop, grids, extract, l, preSolve = preSolve, initBlocks = initBlocks, postSolve = postSolve, printSol = printSol) for l in loop)))
-		return {extract[i]: readSolutionLoop(n, loop, i, extract, self.db) for i in range(len(extract))}
+		n = [(self.loopSolveExtract_l(loop, grids, extract, l, preSolve = preSolve, initBlocks = initBlocks, postSolve = postSolve, printSol = printSol), self.solveStats) for l in loop]
+		return self.readSweep(n, loop, extract)
+
+	def readSweep(self, n, loop, extract):
+		""" Collect list of (extracted symbols, solveStats) from grid points; solver statistics are stored in self.sweepStats """
+		self.sweepStats = pd.DataFrame([x[1] for x in n], index = loop)
+		n = [x[0] for x in n]
+		return {extract[i]: readSolutionLoop(list(itertools.chain.from_iterable(n)), loop, i, extract, dict(zip(extract, n[0]))) for i in range(len(extract))}
 	
+	def loopSolveExtractParallel(self, loop, grids, extract, preSolve=None, initBlocks=None, postSolve=None, printSol=False, max_workers=None, chunksize=1):
+		""" Parallel version of loopSolveExtract: The model is shipped to max_workers processes once, and each grid point only sends the 
+			parameter values from grids. self.db is not modified. Blocks compiled with lpBlock(compileMode = 'codes', incremental = True) are reused 
+			as a template across the grid points solved by the same worker. """
+		kwargs = {'preSolve': preSolve, 'initBlocks': initBlocks, 'postSolve': postSolve, 'printSol': printSol}
+		with ProcessPoolExecutor(max_workers = max_workers, initializer = _initSweep, initargs = (self,)) as executor:
+			n = list(executor.map(_solveSweep, (gridDeltas(grids, loop, l) for l in loop), itertools.repeat(extract), itertools.repeat(kwargs), chunksize = chunksize))
+		return self.readSweep(n, loop, extract)
+
 	def loopSolveExtract_l(self, loop, grids, extract, l, preSolve=None, initBlocks=None, postSolve=None, printSol=False):
 		updateFromGrids(self.db, grids, loop, l)
+		return self.solveExtract(extract, preSolve = preSolve, initBlocks = initBlocks, postSolve = postSolve, printSol = printSol)
+
+	def solveExtract(self, extract, preSolve=None, initBlocks=None, postSolve=None, printSol=False):
 		if hasattr(self, 'preSolve'):
 			self.preSolve(**noneInit(preSolve, {}))
 		self.initBlocks(**noneInit(initBlocks, {}))
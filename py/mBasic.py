@@ -26,7 +26,7 @@ class mSimple(modelShell):
 		if ('mc' not in self.db.symbols) or recomputeMC:
 			self.db['mc'] = mc(self.db)
 
-	@property
+	@dbProperty
 	def globalDomains(self):
 		return {'Generation': self.db['id'],
 				'Demand': self.db['c']}
@@ -75,7 +75,7 @@ class mRES(mSimple):
 	def __init__(self, db, blocks=None, **kwargs):
 		super().__init__(db, blocks=blocks, **kwargs)
 
-	@property
+	@dbProperty
 	def cleanIds(self):
 		s = (self.db['FuelMix'] * self.db['EmissionIntensity']).groupby('id').sum()
 		return s[s <= 0].index
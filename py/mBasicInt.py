@@ -65,19 +65,19 @@ class mSimple(modelShell):
 		db.updateAlias(alias = [('h','h_constr')])
 		super().__init__(db, blocks = blocks, **kwargs)
 
-	@property
+	@dbProperty
 	def hourlyGeneratingCapacity(self):
 		return (adjMultiIndex.bc(self.db['GeneratingCapacity'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt')
 
-	@property
+	@dbProperty
 	def hourlyCapFactors(self):
 		return adjMultiIndex.bc(adj.rc_pd(self.db['CapVariation'], self.db['id2hvt']), self.db['id2hvt']).droplevel('hvt')
 
-	@property
+	@dbProperty
 	def hourlyLoad_c(self):
 		return self.db['LoadVariation'] * self.db['Load']
 
-	@property
+	@dbProperty
 	def hourlyLoad(self):
 		return pyDbs.pdSum(self.hourlyLoad_c, 'c')
 
@@ -85,9 +85,13 @@ class mSimple(modelShell):
 		if ('mc' not in self.db.symbols) or recomputeMC:
 			self.db['mc'] = mc(self.db)
 
-	@property
+	@dbProperty
+	def denseDomains(self):
+		return {'Generation': pd.MultiIndex.from_product([self.db['h'], self.db['id']])}
+
+	@dbProperty
 	def globalDomains(self):
-		return {'Generation': pd.MultiIndex.from_product([self.db['h'], self.db['id']]),
+		return {'Generation': pruneDomain(self.denseDomains['Generation'], self.hourlyGeneratingCapacity) if self.sparseDomains else self.denseDomains['Generation'],
 				'HourlyDemand': pyDbs.cartesianProductIndex([self.db['c'], self.db['h']]),
 				'equilibrium': self.db['h_constr']}
 
@@ -97,11 +101,11 @@ class mSimple(modelShell):
 				{'varName': 'HourlyDemand', 'value': -adjMultiIndex.bc(self.db['MWP'], self.globalDomains['HourlyDemand'])}]
 	@property
 	def u(self):
-		return [{'varName': 'Generation', 'value': self.hourlyGeneratingCapacity},
+		return [{'varName': 'Generation', 'value': self.hourlyGeneratingCapacity, 'conditions': self.sparseConditions('Generation')},
 				{'varName': 'HourlyDemand', 'value': self.hourlyLoad_c}]
 	@property
 	def l(self):
-		return [{'varName':'Generation','value':0.1*self.hourlyGeneratingCapacity}]
+		return [{'varName':'Generation','value':0.1*self.hourlyGeneratingCapacity, 'conditions': self.sparseConditions('Generation')}]
 
 	@property
 	def b_eq(self):
@@ -135,13 +139,13 @@ class mEmissionCap(mSimple):
 		return [{'constrName': 'emissionsCap', 'value': self.db['CO2Cap']}]
 	@property
 	def A_ub(self):
-		return [{'constrName': 'emissionsCap', 'varName': 'Generation', 'value': adjMultiIndex.bc(plantEmissionIntensity(self.db).xs('CO2',level='EmissionType'), self.db['h'])}]
+		return [{'constrName': 'emissionsCap', 'varName': 'Generation', 'value': adjMultiIndex.bc(plantEmissionIntensity(self.db).xs('CO2',level='EmissionType'), self.db['h']), 'conditions': self.sparseConditions('Generation')}]
 
 class mRES(mSimple):
 	def __init__(self, db, blocks=None, **kwargs):
 		super().__init__(db, blocks=blocks, **kwargs)
 
-	@property
+	@dbProperty
 	def cleanIds(self):
 		s = (self.db['FuelMix'] * self.db['EmissionIntensity']).groupby('id').sum()
 		return s[s <= 0].index
@@ -1,6 +1,7 @@
 from base import *
 from nlModels import *
 from scipy.stats import norm
+from scipy.special import ndtr
 
 # Functions for all mBasicInt_NonLinear models that never depend on endogenous variables
 
@@ -38,7 +39,7 @@ class mSimpleNL(modelShellNL):
 		self.x_vars = {'endo_var':['p'],'theta_var':['FuelMix']}
 		self.idx_x = {
 				'p': range(0,len(self.db['h'])),
-				'FuelMix': range(len(self.db['h'])+1,len(self.db['h'])+1+len(self.db['FuelMix']))
+				'FuelMix': range(len(self.db['h']),len(self.db['h'])+len(self.db['FuelMix']))
 			} 		# index of vector with endogenous variables
 		self.set_model_properties(kwargs)					# initializing model properties
 		self.set_model_structure()
@@ -75,13 +76,23 @@ class mSimpleNL(modelShellNL):
 		self._hourlyGeneratingCapacity = (adjMultiIndex.bc(self.db['GeneratingCapacity'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt').astype(float)
 		self._hourlyDemand_c = (self.db['LoadVariation'] * self.db['Load']).astype(float)
 		self._Demand = self.hourlyDemand_c.groupby('h').sum()
-		self._fuelCost = self.db['FuelPrice'].add(pyDbs.pdSum(self.db['EmissionIntensity'] * self.db['EmissionTax'], 'EmissionType'), fill_value=0).astype(float)
-		self._averageMC = (pyDbs.pdSum((self.db['FuelMix'] * self.fuelCost).dropna(), 'BFt') + self.db['OtherMC']).astype(float)
-		self._mc_lo = pd.Series(0,index=self.id2h).add(self.averageMC + norm.ppf(np.finfo(float).eps) * self.sigma).astype(float)
+		self._fuelCost = self.fuelCostFrom(self.db['FuelPrice'], self.db['EmissionTax'])
 		self._mc_nonZeroMarginalGeneration_invpdf = pd.Series(0,index=self.id2h).add(np.finfo(float).eps*self.sigma*np.sqrt(2*np.pi)).div(self.hourlyGeneratingCapacity).apply(np.log).mul(-2).apply(np.sqrt)
+		self._Targets = None
+		self.set_marginal_costs()
+
+	def set_marginal_costs(self):
+		""" Parameters that depend on the FuelMix: average marginal costs, the bounds on marginal costs and the kernel. """
+		self._averageMC = self.averageMCFrom(self.fuelCost)
+		self._mc_lo = pd.Series(0,index=self.id2h).add(self.averageMC + norm.ppf(np.finfo(float).eps) * self.sigma).astype(float)
 		self._mc_nonZeroMarginalGeneration_lo = self.averageMC - self.sigma*self.mc_nonZeroMarginalGeneration_invpdf
 		self._mc_nonZeroMarginalGeneration_up = self.averageMC + self.sigma*self.mc_nonZeroMarginalGeneration_invpdf
-		self._Targets = None
+		self.set_kernel()
+
+	def update_estimated_parameters(self):
+		""" Refreshes the parameters that depend on the estimated FuelMix after Estimate, keeping Targets and the remaining parameters. """
+		self.set_marginal_costs()
+		self.set_estimation_structure()
 	
 	def set_model_structure(self):
 		""" This is a function loading in multiple read model properties """
@@ -92,7 +103,24 @@ class mSimpleNL(modelShellNL):
 		self._h_rowidx = pd.Series(1,index=self.h2h_alias).groupby('h').ngroup().values
 		self._h_colidx = pd.Series(1,index=self.h2h_alias).groupby('h_alias').ngroup().values
 		self._sparse_ones_HxH_matrix = sparseMatrixFromSeries(pd.Series(1,index=self.h2h_alias).astype(float),columns=['h_alias']).tocsc()
-
+		self.set_kernel_structure()
+
+	def set_kernel_structure(self):
+		""" Integer codes used by the vectorized model equations: The position of the hour of each [id,h] in db['h'] and the position of the price in x. """
+		self._h_code = pd.Index(self.db['h']).get_indexer(self.id2h.get_level_values('h'))
+		self._x_code = np.asarray(self.idx_x['p'])[self.h_code]
+
+	def set_kernel(self):
+		""" Contiguous float arrays aligned with id2h used by the vectorized model equations. """
+		mc = np.ascontiguousarray(self.averageMC.reindex(self.id2h.get_level_values('id')).values, dtype=float)
+		cap = np.ascontiguousarray(self.hourlyGeneratingCapacity.reindex(self.id2h).values, dtype=float)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			invpdf = np.sqrt(-2*np.log(np.finfo(float).eps*self.sigma*np.sqrt(2*np.pi)/cap))
+		self._kernel = {'mc': mc, 'cap': cap,
+						'mc_lo': mc+norm.ppf(np.finfo(float).eps)*self.sigma,
+						'nzmg_lo': mc-self.sigma*invpdf,
+						'nzmg_up': mc+self.sigma*invpdf,
+						'Demand': self.Demand.reindex(self.db['p'].index).values.astype(float)}
 
 	@property
 	def model_type(self):
@@ -119,6 +147,14 @@ class mSimpleNL(modelShellNL):
 # independent of the market equilibrium
 ###########################################
 
+	def fuelCostFrom(self,FuelPrice,EmissionTax):
+		""" Marginal fuel costs in €/GJ given fuel prices and emission taxes """
+		return FuelPrice.add(pyDbs.pdSum(self.db['EmissionIntensity'] * EmissionTax, 'EmissionType'), fill_value=0).astype(float)
+
+	def averageMCFrom(self,fuelCost):
+		""" Marginal costs in €/GJ given marginal fuel costs """
+		return (pyDbs.pdSum((self.db['FuelMix'] * fuelCost).dropna(), 'BFt') + self.db['OtherMC']).astype(float)
+
 	@property
 	def sigma(self):
 		return self._sigma
@@ -137,6 +173,8 @@ class mSimpleNL(modelShellNL):
 	def hourlyGeneratingCapacity(self,series):
 		self._hourlyGeneratingCapacity = series
 		self._id2h = series.index
+		self.set_kernel_structure()
+		self.set_kernel()
 	
 	@property
 	def hourlyDemand_c(self):
@@ -173,6 +211,7 @@ class mSimpleNL(modelShellNL):
 	@averageMC.setter
 	def averageMC(self,series):
 		self._averageMC = series
+		self.set_kernel()
 
 	@property
 	def Targets(self):
@@ -215,6 +254,14 @@ class mSimpleNL(modelShellNL):
 	def h2h_alias(self,multiindex):
 		self._h2h_alias = multiindex
 
+	@property
+	def h_code(self):
+		return self._h_code
+
+	@h_code.setter
+	def h_code(self,array):
+		raise WritePropertyError("'h_code' is read-only and determined by id2h.")
+
 ###########################################
 # Model equations
 ###########################################
@@ -238,11 +285,52 @@ class mSimpleNL(modelShellNL):
 
 	def Supply(self,x):
 		""" Aggregate supply """
-		return self.HourlyGeneration(x).groupby('h').sum()
+		return pd.Series(self.kernel_Supply(x),index=self.db['p'].index)
 
 	def ExcessDemand(self,x):
 		""" Equilibrium definition defined as excess demand"""
-		return self.Demand - self.Supply(x)
+		return pd.Series(self.kernel_ExcessDemand(x),index=self.db['p'].index)
+
+###########################################
+# Vectorized kernel of the model equations
+# (numpy arrays aligned with id2h and h)
+###########################################
+
+	def kernel_CapacityUtilizationDiscrete(self,x,e=slice(None)):
+		""" Inner object in optimal capacity utilization for all [id,h] in id2h (or the elements e of id2h) """
+		return (np.asarray(x,dtype=float)[self._x_code[e]]-self._kernel['mc'][e])/self.sigma
+
+	def kernel_mask(self,x,derivative=False,e=slice(None)):
+		""" Elements of id2h that are included in the model equations (None if all are included) """
+		if self.model_type=='normal':
+			return None
+		p = np.asarray(x,dtype=float)[self._x_code[e]]
+		return (p>=self._kernel['nzmg_lo'][e]) & (p<=self._kernel['nzmg_up'][e]) if derivative else p>=self._kernel['mc_lo'][e]
+
+	def kernel_HourlyGeneration(self,x,e=slice(None)):
+		""" Optimal generation for all [id,h] in id2h """
+		out = self._kernel['cap'][e]*ndtr(self.kernel_CapacityUtilizationDiscrete(x,e=e))
+		mask = self.kernel_mask(x,e=e)
+		return out if mask is None else np.where(mask, out, 0)
+
+	def kernel_dHourlyGeneration_dp(self,x,e=slice(None)):
+		""" Derivative of optimal generation wrt. prices for all [id,h] in id2h """
+		z = self.kernel_CapacityUtilizationDiscrete(x,e=e)
+		out = self._kernel['cap'][e]*(np.exp(-z**2/2.0)/np.sqrt(2*np.pi)/self.sigma)
+		mask = self.kernel_mask(x,derivative=True,e=e)
+		return out if mask is None else np.where(mask, out, 0)
+
+	def kernel_Supply(self,x,e=slice(None)):
+		""" Aggregate supply per hour in db['h'] (hours without elements in e are zero) """
+		return np.bincount(self.h_code[e], weights=self.kernel_HourlyGeneration(x,e=e), minlength=self.H)
+
+	def kernel_ExcessDemand(self,x,e=slice(None)):
+		""" Excess demand per hour in db['h'] """
+		return self._kernel['Demand']-self.kernel_Supply(x,e=e)
+
+	def kernel_dExcessDemand_dp(self,x,e=slice(None)):
+		""" Diagonal of the Jacobian of the excess demand function """
+		return -np.bincount(self.h_code[e], weights=self.kernel_dHourlyGeneration_dp(x,e=e), minlength=self.H)
 
 ###########################################
 # Model equations without machine zeros
@@ -290,18 +378,15 @@ class mSimpleNL(modelShellNL):
 
 	def dSupply_dp(self,x):
 		""" Derivative of aggregate supply wrt. prices """
-		return self.dHourlyGeneration_dp(x).groupby('h').sum()
+		return pd.Series(-self.kernel_dExcessDemand_dp(x),index=self.db['p'].index)
 
 	def dExcessDemand_dp(self,x):
 		""" derivative of the excess demand function """
-		return -pd.Series(self.dSupply_dp(x).values,index=self.h2h_alias)
+		return pd.Series(self.kernel_dExcessDemand_dp(x),index=self.h2h_alias)
 
 	def ExcessDemand_Jacobian(self,x):
 		""" Jacobian of the excess demand function """
-		out = np.zeros((self.H,self.H)) # matrix of m x m of zeros
-		idx = np.diag_indices(self.H,ndim=2) # getting the indices of the diagonal (only diagonal is non-zero)
-		out[idx] = self.dExcessDemand_dp(x) # derivatives inserted on the diagonal
-		return out
+		return np.diag(self.kernel_dExcessDemand_dp(x)) # only the diagonal is non-zero
 
 ###########################################
 # Jacobian matrix of the Excess Demand
@@ -421,19 +506,104 @@ class mSimpleNL(modelShellNL):
 		# return -(self.ExcessDemand(p)/self.dExcessDemand_dp(p).droplevel('h_alias')).values
 
 	def manualSolver(self,x0=None,n_iter = 100):
-		""" Method using Newton-Kantorowich for rootfinding using a sparse Jacobian of the excess demand function """
-		i = 1
-		p = x0[self.idx_x['p']]
-		p_step = np.ones(p.shape)
-		while (np.isclose(p_step,b=0).all()==False) & (i<=n_iter):
-		# while (np.isclose(self.ExcessDemand(p),b=0).all()==False) & (i<=n_iter):
-			# print('At iteration:' '\t' + str(i))
-			p_step = self.NewtonStep(p)
-			p = p + p_step
-			# print('\t The number of markets in equilibrium is:\t' +str(np.isclose(p_step,b=0).sum()))
-			# print('\t The Kantorowich constant is:\t' + str(round(self.KantorowichConstant(p),2)))
-			i+=1
-		return p
+		""" Method for rootfinding that solves the H hourly markets as independent scalar problems (the Jacobian of the excess demand function is diagonal) """
+		return self.hourlyNewtonSolver(x0=x0,n_iter=n_iter)[self.idx_x['p']]
+
+###########################################
+# Per-hour safeguarded Newton solver
+###########################################
+
+	def hourlyBrackets(self,mc=None):
+		""" Price brackets per hour: Below the smallest mc_lo generation is virtually zero, and above the largest mc_nonZeroMarginalGeneration_up 
+			all capacity is virtually utilized. Hours without capacity get the bracket [0,0]. mc are marginal costs for all [id,h] in id2h (default: averageMC). """
+		B = {'mc': (self._kernel['mc'] if mc is None else mc)[None,:], 'sigma': np.array([self.sigma])}
+		return tuple(b[0] for b in self.batchBrackets(B))
+
+	def hourlyNewtonSolver(self,x0=None,n_iter=100,tol=1e-8,n_expand=50):
+		""" Vectorized Newton's method with bisection fallback for each hour (see safeguardedNewton): The hourly excess demand is decreasing in 
+			the price of the hour only. Converged hours are masked out of the following function evaluations. Convergence per hour is stored in self.convergence. """
+		x = np.zeros(max(self.idx_x['p'])+1) if x0 is None else np.array(x0,dtype=float)
+		idx = np.asarray(self.idx_x['p'])
+		def fun(p,active):
+			x[idx] = p
+			e = np.flatnonzero(active[self.h_code])
+			return self.kernel_ExcessDemand(x,e=e), self.kernel_dExcessDemand_dp(x,e=e)
+		p, converged, iterations, f = safeguardedNewton(fun, *self.hourlyBrackets(), p0=None if x0 is None else x[idx].copy(), tol=tol, n_iter=n_iter, n_expand=n_expand)
+		x[idx] = p
+		self.convergence = pd.DataFrame({'converged': converged, 'iterations': iterations, 'ExcessDemand': f}, index=self.db['p'].index)
+		if not converged.all():
+			warnings.warn(f"Newton solver did not converge in {(~converged).sum()} hours (see self.convergence).", UserErrorMessage)
+		return x
+
+###########################################
+# Batched multi-scenario equilibria
+###########################################
+
+	_scenarioParameters = ('FuelPrice','EmissionTax','Load','sigma')
+
+	def scenarioValue(self,scenario,k):
+		""" Value of parameter k in the scenario (a dict of overrides); scalars are broadcast to the domain of the symbol in the database """
+		if k=='sigma':
+			return float(scenario.get(k,self.sigma))
+		v = scenario.get(k,self.db[k])
+		return v if isinstance(v,pd.Series) else pd.Series(v,index=self.db[k].index,name=k)
+
+	def batchParameters(self,scenarios):
+		""" Stack the parameters of a list of scenarios with one row per scenario: Marginal costs for all [id,h] in id2h, hourly demand and sigma. """
+		if (unknown := {k for scenario in scenarios for k in scenario}-set(self._scenarioParameters)):
+			raise KeyError(f"Scenarios can only change {self._scenarioParameters}, not {unknown}")
+		ids = self.id2h.get_level_values('id')
+		return {'mc': np.vstack([self.averageMCFrom(self.fuelCostFrom(self.scenarioValue(s,'FuelPrice'), self.scenarioValue(s,'EmissionTax'))).reindex(ids).values for s in scenarios]).astype(float),
+				'Demand': np.vstack([(self.db['LoadVariation'] * self.scenarioValue(s,'Load')).groupby('h').sum().reindex(self.db['p'].index).values for s in scenarios]).astype(float),
+				'sigma': np.array([self.scenarioValue(s,'sigma') for s in scenarios])}
+
+	def batch_HourlyGeneration(self,P,B,s,j):
+		""" Optimal generation and its derivative wrt. prices for the elements (s,j) of (scenarios x id2h), given prices P (scenarios x hours) """
+		p, mc, sigma, cap = P[s,self.h_code[j]], B['mc'][s,j], B['sigma'][s], self._kernel['cap'][j]
+		z = (p-mc)/sigma
+		gen, dgen = cap*ndtr(z), cap*(np.exp(-z**2/2.0)/np.sqrt(2*np.pi)/sigma)
+		if self.model_type=='no machine zeros':
+			with np.errstate(divide='ignore', invalid='ignore'):
+				invpdf = np.sqrt(-2*np.log(np.finfo(float).eps*sigma*np.sqrt(2*np.pi)/cap))
+			gen, dgen = np.where(p>=mc+norm.ppf(np.finfo(float).eps)*sigma, gen, 0), np.where((p>=mc-sigma*invpdf) & (p<=mc+sigma*invpdf), dgen, 0)
+		return gen, dgen
+
+	def batch_ExcessDemand(self,P,B,active=None):
+		""" Excess demand and its derivative (the diagonal of the Jacobian) as (scenarios x hours) arrays. Only the boolean (scenarios x hours) 
+			array active is evaluated, if it is specified. """
+		S = P.shape[0]
+		s, j = np.nonzero(np.ones((S,len(self.h_code)),dtype=bool) if active is None else active[:,self.h_code])
+		gen, dgen = self.batch_HourlyGeneration(P,B,s,j)
+		code = s*self.H+self.h_code[j]
+		return B['Demand']-np.bincount(code, weights=gen, minlength=S*self.H).reshape(S,self.H), -np.bincount(code, weights=dgen, minlength=S*self.H).reshape(S,self.H)
+
+	def batchBrackets(self,B):
+		""" Price brackets per scenario and hour (see hourlyBrackets) """
+		S, sigma, mc, cap = len(B['sigma']), B['sigma'][:,None], B['mc'], self._kernel['cap']
+		with np.errstate(divide='ignore', invalid='ignore'):
+			mc_up = mc+sigma*np.sqrt(-2*np.log(np.finfo(float).eps*sigma*np.sqrt(2*np.pi)/cap))
+		code = (np.arange(S)[:,None]*self.H+self.h_code).ravel()
+		lo, up = np.full(S*self.H, np.inf), np.full(S*self.H, -np.inf)
+		np.minimum.at(lo, code, (mc+norm.ppf(np.finfo(float).eps)*sigma).ravel())
+		np.maximum.at(up, code, np.where(np.isnan(mc_up), mc, mc_up).ravel())
+		return np.where(np.isfinite(lo), lo, 0).reshape(S,self.H), np.where(np.isfinite(up), up, 0).reshape(S,self.H)
+
+	def batchSolve(self,scenarios,sigma_grid=None,x0=None,n_iter=100,tol=1e-8,n_expand=50):
+		""" Solve for the equilibrium prices of a stack of scenarios simultaneously. scenarios is a dict (or list) of dicts that override 'FuelPrice', 
+			'EmissionTax', 'Load' and/or 'sigma'. With a sigma_grid, all scenarios are first solved for each sigma in the grid, and the prices are 
+			carried along the path as warm starts for the final solve at the sigma of each scenario. The model itself is not changed. 
+			Returns a dataframe over [scenario,id,h] with equilibrium prices, hourly generation and convergence of the hourly market. """
+		names, scenarios = (list(scenarios.keys()), list(scenarios.values())) if isinstance(scenarios,dict) else (list(range(len(scenarios))), list(scenarios))
+		B = self.batchParameters(scenarios)
+		P = None if x0 is None else np.tile(np.asarray(x0,dtype=float)[self.idx_x['p']], (len(names),1))
+		for sigma in list(noneInit(sigma_grid,[]))+[None]:
+			B_sigma = B if sigma is None else dict(B, sigma=np.full(len(names), float(sigma)))
+			P, converged, iterations, f = safeguardedNewton(lambda P_,active: self.batch_ExcessDemand(P_,B_sigma,active), *self.batchBrackets(B_sigma), p0=P, tol=tol, n_iter=n_iter, n_expand=n_expand)
+		if not converged.all():
+			warnings.warn(f"Newton solver did not converge in {(~converged).sum()} scenario-hours.", UserErrorMessage)
+		s, j = np.divmod(np.arange(len(names)*len(self.h_code)), len(self.h_code))
+		index = pd.MultiIndex.from_arrays([np.asarray(names, dtype=object)[s], self.id2h.get_level_values('id')[j], self.id2h.get_level_values('h')[j]], names=['scenario','id','h'])
+		return pd.DataFrame({'p': P[s,self.h_code[j]], 'hourlyGeneration': self.batch_HourlyGeneration(P,B,s,j)[0], 'converged': converged[s,self.h_code[j]]}, index=index)
 
 ###########################################
 # Estimation/calibration
@@ -442,16 +612,179 @@ class mSimpleNL(modelShellNL):
 	def FuelConsumption(self,x):
 		return (self.HourlyGeneration(x) * self.db['FuelMix']).groupby(['h','BFt']).sum()
 
-
-	def averageFuelIntensity(self,x):
-		return adjMultiIndex.bc(self.FuelConsumption(x),self.db['h2hDay']).groupby(['hDay','BFt']).sum() / adjMultiIndex.bc(self.Supply(x),self.db['h2hDay']).groupby(['hDay','BFt']).sum().sort_index()
-
 	def MarginalFuelConsumption(self,x):
 		return (self.dHourlyGeneration_dp(x) * self.db['FuelMix']).groupby(['h','BFt']).sum()
 
+	def set_estimation_structure(self):
+		""" Arrays and sparse matrices used in estimation: The pairs (P_j,P_k) of elements j in id2h and entries k in FuelMix with the same id, 
+			the fuel costs of the entries (c_k), the marginal costs net of fuel costs (c0), the aggregation from hours to days (h2hDay) and the 
+			matrix A with the derivatives of (p-mc) wrt. x for all elements in id2h. Rebuilt at the start of each estimation. """
+		fm, N = self.db['FuelMix'], len(self.h_code)
+		ids = pd.Index(sorted(set(self.id2h.get_level_values('id')) | set(fm.index.get_level_values('id'))), name='id')
+		fuels = pd.Index(sorted(fm.index.get_level_values('BFt').unique()), name='BFt')
+		j_id, k_id, k_b = ids.get_indexer(self.id2h.get_level_values('id')), ids.get_indexer(fm.index.get_level_values('id')), fuels.get_indexer(fm.index.get_level_values('BFt'))
+		order, n = np.argsort(k_id, kind='stable'), np.bincount(k_id, minlength=len(ids))[j_id]
+		P_j = np.repeat(np.arange(N), n)
+		P_k = order[np.repeat(np.searchsorted(k_id[order], j_id), n)+np.arange(len(P_j))-np.repeat(np.cumsum(n)-n, n)]
+		c_k = self.fuelCost.reindex(fm.index.get_level_values('BFt')).fillna(0).values
+		hDay = pd.Series(self.db['h2hDay'].get_level_values('hDay'), index=self.db['h2hDay'].get_level_values('h')).reindex(self.db['p'].index)
+		dh, days = pd.factorize(hDay, sort=True)
+		x_k, x_p = np.asarray(self.idx_x['FuelMix']), np.asarray(self.idx_x['p'])
+		self._est = {'P_j': P_j, 'P_k': P_k, 'c_k': c_k, 'k_id': k_id, 'k_b': k_b, 'j_id': j_id, 'nId': len(ids), 'B': len(fuels), 'x_k': x_k, 'x_p': x_p,
+					 'c0': self._kernel['mc']-np.bincount(P_j, weights=c_k[P_k]*fm.values.astype(float)[P_k], minlength=N),
+					 'dh': dh, 'nDay': len(days), 'h2hDay': sparse.csr_matrix((np.ones(self.H), (dh, np.arange(self.H))), shape=(len(days),self.H)),
+					 'index': pd.MultiIndex.from_product([days, fuels], names=['hDay','BFt']),
+					 'A': sparse.csr_matrix((np.hstack([np.ones(N), -c_k[P_k]]), (np.hstack([np.arange(N), P_j]), np.hstack([x_p[self.h_code], x_k[P_k]]))), shape=(N,max(x_p.max(),x_k.max())+1))}
+
+	def estimationTheta(self,x):
+		""" FuelMix parameters from x (or from the database, if x only holds prices) """
+		return np.asarray(x,dtype=float)[self._est['x_k']] if len(x)>self._est['x_k'].max() else self.db['FuelMix'].values.astype(float)
+
+	def estimationGeneration(self,x):
+		""" Capacity utilization, optimal generation and its derivative wrt. p-mc for all [id,h] in id2h with marginal costs given by the FuelMix in x """
+		e, θ = self._est, self.estimationTheta(x)
+		mc = e['c0']+np.bincount(e['P_j'], weights=e['c_k'][e['P_k']]*θ[e['P_k']], minlength=len(self.h_code))
+		z = (np.asarray(x,dtype=float)[self._x_code]-mc)/self.sigma
+		return z, self._kernel['cap']*ndtr(z), self._kernel['cap']*(np.exp(-z**2/2.0)/np.sqrt(2*np.pi)/self.sigma), θ
+
+	def kernel_averageFuelIntensity(self,x):
+		""" Daily fuel consumption per unit of supply as a (days x BFt) array, and the intermediate results used in its derivative """
+		e = self._est
+		z, gen, dgen, θ = self.estimationGeneration(x)
+		F = np.bincount(self.h_code[e['P_j']]*e['B']+e['k_b'][e['P_k']], weights=gen[e['P_j']]*θ[e['P_k']], minlength=self.H*e['B']).reshape(self.H,e['B'])
+		Dn = e['h2hDay'] @ np.bincount(self.h_code, weights=gen, minlength=self.H)
+		return (e['h2hDay'] @ F)/Dn[:,None], {'gen': gen, 'dgen': dgen, 'θ': θ, 'Dn': Dn}
+
+	def averageFuelIntensity(self,x):
+		return pd.Series(self.kernel_averageFuelIntensity(x)[0].ravel(), index=self._est['index'], name='averageFuelIntensity')
+
+	def dAverageFuelIntensity_dx(self,x):
+		""" Sparse Jacobian of the (days x BFt) average fuel intensities wrt. x """
+		e = self._est
+		I, v = self.kernel_averageFuelIntensity(x)
+		dgen, gen, θ, Dn, B, dh = v['dgen'], v['gen'], v['θ'], v['Dn'], e['B'], e['dh']
+		# Prices: An hour only affects the intensities of its day:
+		Mp = np.bincount(self.h_code[e['P_j']]*B+e['k_b'][e['P_k']], weights=dgen[e['P_j']]*θ[e['P_k']], minlength=self.H*B).reshape(self.H,B)
+		dS = np.bincount(self.h_code, weights=dgen, minlength=self.H)
+		rows_p, cols_p = dh[:,None]*B+np.arange(B), np.repeat(e['x_p'][:,None], B, axis=1)
+		vals_p = (Mp-I[dh]*dS[:,None])/Dn[dh][:,None]
+		# FuelMix: The derivatives of generation and fuel consumption per id are aggregated by day (A: marginal generation, G: generation):
+		code = dh[self.h_code]*e['nId']+e['j_id']
+		A = np.bincount(code, weights=dgen, minlength=e['nDay']*e['nId']).reshape(e['nDay'],e['nId'])[:,e['k_id']]
+		G = np.bincount(code, weights=gen, minlength=e['nDay']*e['nId']).reshape(e['nDay'],e['nId'])[:,e['k_id']]
+		Θ = np.zeros((e['nId'],B))
+		Θ[e['k_id'],e['k_b']] = θ
+		vals_k = (e['c_k']*A)[:,None,:]*(I[:,:,None]-Θ[e['k_id'],:].T[None,:,:])
+		vals_k[:,e['k_b'],np.arange(len(θ))] += G
+		vals_k /= Dn[:,None,None]
+		rows_k = np.broadcast_to((np.arange(e['nDay'])[:,None]*B+np.arange(B))[:,:,None], vals_k.shape)
+		cols_k = np.broadcast_to(e['x_k'][None,None,:], vals_k.shape)
+		return sparse.csr_matrix((np.hstack([vals_p.ravel(), vals_k.ravel()]), (np.hstack([rows_p.ravel(), rows_k.ravel()]), np.hstack([cols_p.ravel(), cols_k.ravel()]))), shape=(e['nDay']*B, e['A'].shape[1]))
+
+	def estimationWeights(self,weight_matrix=None):
+		return sparse.identity(self._est['nDay']*self._est['B'], format='csr') if weight_matrix is None else weight_matrix
+
+	def estimationResiduals(self,x):
+		if self.Targets is None or len(self.Targets)!=self._est['nDay']*self._est['B']:
+			raise ValueError(f"Targets must be an array of {self._est['nDay']*self._est['B']} daily fuel intensities ordered as {self._est['index'].names}")
+		return self.kernel_averageFuelIntensity(x)[0].ravel()-self.Targets
+
+	def dEstimationResiduals_dx(self,x):
+		return self.dAverageFuelIntensity_dx(x)
+
 	def EstimationObjective(self,x,weight_matrix=None):
-		diff = self.averageFuelIntensity(x)-self.Targets
-		return np.matmul(np.matmul((diff).transpose(),weight_matrix),diff)
+		diff = self.estimationResiduals(x)
+		return diff @ (self.estimationWeights(weight_matrix) @ diff)
+
+	def dEstimationObjective_dx(self,x,weight_matrix=None):
+		""" Gradient of the estimation objective wrt. x """
+		W, diff = self.estimationWeights(weight_matrix), self.estimationResiduals(x)
+		return self.dAverageFuelIntensity_dx(x).T @ (W @ diff + W.T @ diff)
+
+	def EstimationObjective_GaussNewton(self,x,weight_matrix=None):
+		""" Gauss-Newton approximation of the Hessian of the estimation objective as a linear operator """
+		W, J = self.estimationWeights(weight_matrix), self.dAverageFuelIntensity_dx(x)
+		return sparse.linalg.LinearOperator((J.shape[1],J.shape[1]), matvec = lambda v: J.T @ (W @ (J @ v) + W.T @ (J @ v)))
+
+	def EstimationConstraint(self,x):
+		""" Excess demand with marginal costs given by the FuelMix in x """
+		return self._kernel['Demand']-np.bincount(self.h_code, weights=self.estimationGeneration(x)[1], minlength=self.H)
+
+	def dEstimationConstraint_dx(self,x):
+		""" Sparse Jacobian of the excess demand wrt. x: Diagonal in prices, and the FuelMix of each id affects the hours with capacity of the id """
+		dgen = self.estimationGeneration(x)[2]
+		return sparse.csr_matrix((-dgen, (self.h_code, np.arange(len(dgen)))), shape=(self.H,len(dgen))) @ self._est['A']
+
+	def EstimationConstraint_hess(self,x,v):
+		""" Sparse Hessian of the excess demand weighted by multipliers v """
+		z, gen, dgen, θ = self.estimationGeneration(x)
+		return (self._est['A'].T @ sparse.diags(np.asarray(v)[self.h_code]*z*dgen/self.sigma) @ self._est['A']).tocsr()
+
+	def estimationEquilibrium(self,x,tol=1e-8,n_iter=100):
+		""" Equilibrium prices given the FuelMix in x (used in nested estimation) """
+		e, x = self._est, np.array(x,dtype=float)
+		mc = e['c0']+np.bincount(e['P_j'], weights=e['c_k'][e['P_k']]*self.estimationTheta(x)[e['P_k']], minlength=len(self.h_code))
+		def fun(p,active):
+			x[e['x_p']] = p
+			j = np.flatnonzero(active[self.h_code])
+			z, gen, dgen, θ = self.estimationGeneration(x)
+			return self._kernel['Demand']-np.bincount(self.h_code[j], weights=gen[j], minlength=self.H), -np.bincount(self.h_code[j], weights=dgen[j], minlength=self.H)
+		x[e['x_p']] = safeguardedNewton(fun, *self.hourlyBrackets(mc=mc), p0=x[e['x_p']], tol=tol, n_iter=n_iter)[0]
+		return x
+
+###########################################
+# Sensitivities of the equilibrium 
+# (implicit function theorem)
+###########################################
+
+	_sensitivityParameters = ('FuelPrice','EmissionTax','Load','sigma')
+
+	def dAverageMC_dTheta(self,parameters=('FuelPrice','EmissionTax')):
+		""" Derivatives of marginal costs for all [id,h] in id2h wrt. fuel prices and emission taxes as a dataframe with (parameter,element) columns """
+		fm = self.db['FuelMix'].unstack('BFt').reindex(self.id2h.get_level_values('id')).fillna(0).astype(float)
+		out = []
+		if 'FuelPrice' in parameters:
+			out.append(fm.reindex(columns=self.db['FuelPrice'].index, fill_value=0).set_axis(pd.MultiIndex.from_product([['FuelPrice'],self.db['FuelPrice'].index],names=['parameter','element']),axis=1))
+		if 'EmissionTax' in parameters:
+			out.append((fm @ self.EmissionIntensityPerFuel(fm.columns)).reindex(columns=self.db['EmissionTax'].index, fill_value=0).set_axis(pd.MultiIndex.from_product([['EmissionTax'],self.db['EmissionTax'].index],names=['parameter','element']),axis=1))
+		return pd.concat(out,axis=1).set_axis(self.id2h,axis=0) if out else pd.DataFrame(index=self.id2h)
+
+	def EmissionIntensityPerFuel(self,fuels):
+		""" EmissionIntensity as a (BFt x EmissionType) dataframe over the fuels """
+		return self.db['EmissionIntensity'].unstack('EmissionType').reindex(fuels).fillna(0).astype(float)
+
+	def EquilibriumSensitivities(self,x=None,parameters=None):
+		""" Derivatives of equilibrium prices, hourly generation and hourly emissions wrt. the parameters ('FuelPrice', 'EmissionTax', 'Load' and/or 'sigma') 
+			at a solved equilibrium x (default self.x). By the implicit function theorem dp/dθ = -(dED/dp)^(-1) dED/dθ, where dED/dp is diagonal, 
+			such that the derivatives wrt. all parameters follow from one (elementwise) solve. Returns a dict of dataframes with (parameter,element) columns. """
+		x = self.x if x is None else x
+		parameters = noneInit(parameters, self._sensitivityParameters)
+		if (unknown := set(parameters)-set(self._sensitivityParameters)):
+			raise KeyError(f"Sensitivities are only available for {self._sensitivityParameters}, not {unknown}")
+		z, dgen, N = self.kernel_CapacityUtilizationDiscrete(x), self.kernel_dHourlyGeneration_dp(x), len(self.h_code)
+		# Direct effects of each parameter (at fixed prices) on generation and demand:
+		blocks = []
+		if {'FuelPrice','EmissionTax'} & set(parameters):
+			dmc = self.dAverageMC_dTheta(parameters)
+			blocks.append((dmc.columns, -dgen[:,None]*dmc.values, np.zeros((self.H,dmc.shape[1]))))
+		if 'Load' in parameters:
+			lv = self.db['LoadVariation'].unstack('c').reindex(index=self.db['p'].index, columns=self.db['Load'].index).fillna(0).values.astype(float)
+			blocks.append((pd.MultiIndex.from_product([['Load'],self.db['Load'].index],names=['parameter','element']), np.zeros((N,lv.shape[1])), lv))
+		if 'sigma' in parameters:
+			blocks.append((pd.MultiIndex.from_tuples([('sigma','')],names=['parameter','element']), (-dgen*z)[:,None], np.zeros((self.H,1))))
+		columns = reduce(lambda l,r: l.append(r), [b[0] for b in blocks])
+		dGen_direct, dDemand = np.hstack([b[1] for b in blocks]), np.hstack([b[2] for b in blocks])
+		# Solve with the diagonal Jacobian of the excess demand:
+		h2id2h = sparse.csr_matrix((np.ones(N), (self.h_code, np.arange(N))), shape=(self.H,N))
+		dp = -(dDemand-h2id2h @ dGen_direct)/self.kernel_dExcessDemand_dp(x)[:,None]
+		dGen = dgen[:,None]*dp[self.h_code]+dGen_direct
+		# Emissions per emission type and hour:
+		fm = self.db['FuelMix'].unstack('BFt').reindex(self.id2h.get_level_values('id')).fillna(0).astype(float)
+		ε = fm @ self.EmissionIntensityPerFuel(fm.columns)
+		dEmissions = np.vstack([h2id2h @ (dGen*ε[e].values[:,None]) for e in ε.columns])
+		return {'p': pd.DataFrame(dp, index=self.db['p'].index, columns=columns),
+				'hourlyGeneration': pd.DataFrame(dGen, index=self.id2h, columns=columns),
+				'Emissions': pd.DataFrame(dEmissions, index=pd.MultiIndex.from_product([ε.columns, self.db['p'].index], names=['EmissionType','h']), columns=columns)}
 
 ###########################################
 # Welfare calculations and other
@@ -1,4 +1,5 @@
 from base import *
+import copy
 from lpCompiler import _blocks
 from lpModels import modelShell
 
@@ -35,10 +36,12 @@ def marginalEconomicValue(m):
 									subsetIdsTech(-pyDbs.pdSum((m.db['λ_Generation_H'].xs('u',level='_type')  * m.hourlyCapFactors).dropna(), 'h').add( 1000 * m.db['FOM'] * len(m.db['h'])/8760, fill_value = 0).droplevel('g_H'),('Standard (H)','Heat pump'), m.db)
 									)
 
+@dbMemo
 def getTechs(techs, db):
 	""" Subset on tech types"""
 	return adj.rc_pd(db['id2modelTech2tech'].droplevel('tech'), pd.Index(techs if is_iterable(techs) else [techs], name = 'modelTech')).droplevel('modelTech')
 
+@dbMemo
 def getTechs_i(techs, db):
 	""" Subset on tech types"""
 	return adj.rc_pd(db['id2modelTech2tech'].droplevel('modelTech'), pd.Index(techs if is_iterable(techs) else [techs], name = 'tech')).droplevel('tech')
@@ -72,34 +75,34 @@ class mSimple(modelShell):
 	def modelTech_H(self):
 		return ('Standard (H)','Backpressure','Heat pump')
 
-	@property
+	@dbProperty
 	def hourlyCapFactors(self):
 		return adjMultiIndex.bc(self.db['CapVariation'], self.db['id2hvt']).droplevel('hvt')
-	@property
+	@dbProperty
 	def hourlyGeneratingCap_E(self):
 		return subsetIdsTech( (adjMultiIndex.bc(self.db['GeneratingCap_E'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt'),
 								('Standard (E)','Backpressure'), self.db)
-	@property
+	@dbProperty
 	def hourlyGeneratingCap_H(self):
 		return subsetIdsTech( (adjMultiIndex.bc(self.db['GeneratingCap_H'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt'),
 								('Standard (H)','Heat pump'), self.db)
-	@property
+	@dbProperty
 	def hourlyLoad_cE(self):
 		return adjMultiIndex.bc(self.db['Load_E'] * self.db['LoadVariation_E'], self.db['c_E2g_E']).reorder_levels(['c_E','g_E','h'])
-	@property
+	@dbProperty
 	def hourlyLoad_cH(self):
 		return adjMultiIndex.bc(self.db['Load_H'] * self.db['LoadVariation_H'], self.db['c_H2g_H']).reorder_levels(['c_H','g_H','h'])
-	@property
+	@dbProperty
 	def hourlyLoad_E(self):
 		return pyDbs.pdSum(self.hourlyLoad_cE, 'c_E')
-	@property
+	@dbProperty
 	def hourlyLoad_H(self):
 		return pyDbs.pdSum(self.hourlyLoad_cH, 'c_H')
 
 	def preSolve(self, recomputeMC=False, **kwargs):
 			if ('mc' not in self.db.symbols) or recomputeMC:
 				self.db['mc'] = mc(self.db)
-	@property
+	@dbProperty
 	def globalDomains(self):
 		return {'Generation_E': pyDbs.cartesianProductIndex([subsetIdsTech(self.db['id2g_E'], self.modelTech_E, self.db), self.db['h']]),
 				'Generation_H': pyDbs.cartesianProductIndex([subsetIdsTech(self.db['id2g_H'], self.modelTech_H, self.db), self.db['h']]),
@@ -170,13 +173,99 @@ class mSimple(modelShell):
 		if solution['status'] == 0:
 			self.unloadToDb(solution)
 			self.db['Welfare'] = -solution['fun']
-			self.db['FuelConsumption'] = fuelConsumption(self.db)
-			self.db['Emissions'] = emissionsFuel(self.db)
-			self.db['marginalSystemCosts_E'] = marginalSystemCosts(self.db, 'E')
-			self.db['marginalSystemCosts_H'] = marginalSystemCosts(self.db, 'H')
-			self.db['marginalEconomicValue'] = marginalEconomicValue(self)
-			self.db['meanConsumerPrice_E'] = meanMarginalSystemCost(self.db, self.db['HourlyDemand_E'],'E')
-			self.db['meanConsumerPrice_H'] = meanMarginalSystemCost(self.db, self.db['HourlyDemand_H'],'H')
+			self.reportSolution()
+
+	def reportSolution(self):
+		self.db['FuelConsumption'] = fuelConsumption(self.db)
+		self.db['Emissions'] = emissionsFuel(self.db)
+		self.db['marginalSystemCosts_E'] = marginalSystemCosts(self.db, 'E')
+		self.db['marginalSystemCosts_H'] = marginalSystemCosts(self.db, 'H')
+		self.db['marginalEconomicValue'] = marginalEconomicValue(self)
+		self.db['meanConsumerPrice_E'] = meanMarginalSystemCost(self.db, self.db['HourlyDemand_E'],'E')
+		self.db['meanConsumerPrice_H'] = meanMarginalSystemCost(self.db, self.db['HourlyDemand_H'],'H')
+
+class mWindow(mSimple):
+	""" mSimple on the hours in db['h'], where the storage level before the first hour is fixed at stored0 (defined over id, default 0)
+		instead of being linked to the storage level in the last hour. """
+	def __init__(self, db, blocks = None, stored0 = None, **kwargs):
+		super().__init__(db, blocks=blocks, **kwargs)
+		self.stored0 = noneInit(stored0, pd.Series(0, index = getTechs('HS', self.db), dtype = float))
+
+	@property
+	def firstHour(self):
+		return pyDbs.getIndex(self.db['h']).sort_values()[0]
+
+	@property
+	def initialStorage(self):
+		""" Storage level before the first hour net of self discharge on the right hand side of the law of motion in the first hour """
+		dom = self.globalDomains['LawOfMotion_H']
+		s0 = ((1-self.db['selfDischarge'])*self.stored0).reindex(dom.get_level_values('id_constr')).fillna(0).values
+		return pd.Series(np.where(dom.get_level_values('h_constr') == self.firstHour, s0, 0), index = dom)
+
+	@property
+	def b_ub(self):
+		return [v if v['constrName'] != 'LawOfMotion_H' else v | {'value': self.initialStorage} for v in super().b_ub]
+
+	@property
+	def A_ub(self):
+		return [v if (v['constrName'], v['varName']) != ('LawOfMotion_H', 'stored_H') else v | {'value': [v['value'][0], dropHour(v['value'][1], 'h_constr', self.firstHour)]} for v in super().A_ub]
+
+def dropHour(s, level, h):
+	return s[s.index.get_level_values(level) != h]
+
+def restrictHours(v, level, hours):
+	return v[pyDbs.getIndex(v).get_level_values(level).isin(hours)]
+
+def windowDb(db, hours):
+	""" Shallow copy of db with symbols defined over 'h' restricted to hours """
+	w = copy.copy(db)
+	w.symbols = {k: restrictHours(v, 'h', hours) if isinstance(v, (pd.Series, pd.Index)) and 'h' in pyDbs.getIndex(v).names else v for k,v in db.symbols.items()}
+	return w
+
+class mRollingHorizon(mSimple):
+	""" Solves mSimple in windows of 'window' hours that overlap by 'overlap' hours: The first window-overlap hours of each window are kept,
+		and the storage level at the end of these hours is the initial storage level of the next window. Each window is solved by mWindow on 
+		a copy of the db restricted to the hours of the window, such that the size of the LPs does not grow with the number of hours. The 
+		cyclic link between the last and first hour of the year is replaced by the initial storage level stored0 (default 0). The solution 
+		over all hours is unloaded to self.db; kwargs are passed to the models of each window. """
+	def __init__(self, db, blocks = None, window = 168, overlap = 24, stored0 = None, **kwargs):
+		if not 0 <= overlap < window:
+			raise ValueError(f"The overlap ({overlap}) should be non-negative and smaller than the window ({window})")
+		super().__init__(db, blocks=blocks, **kwargs)
+		self.window, self.overlap, self.stored0, self.windowKwargs = window, overlap, stored0, kwargs
+
+	@property
+	def windows(self):
+		""" List of (hours in window, hours kept) """
+		h = pyDbs.getIndex(self.db['h']).sort_values()
+		step = self.window-self.overlap
+		return [(h[i:i+self.window], h[i:i+step]) for i in range(0, len(h), step)]
+
+	def initBlocks(self, **kwargs):
+		pass
+
+	def solve(self, printSol = True, solKwargs = None, solOptions = None, postKwargs = None, **kwargs):
+		stored0, sols, stats, welfare = self.stored0, [], [], 0
+		for hours, keep in self.windows:
+			m = mWindow(windowDb(self.db, hours), stored0 = stored0, method = self.method, computeDual = self.computeDual, **self.windowKwargs)
+			m(execute = {'initBlocks': {}, 'solve': {'printSol': False, 'solKwargs': solKwargs, 'solOptions': solOptions}})
+			stats.append(m.solveStats)
+			if m.solveStats['status'] != 0:
+				break
+			sols.append({k: restrictHours(m.db[k], next(l for l in ('h','h_constr') if l in pyDbs.getDomains(m.db[k])), keep) for k in self.windowSymbols(m)})
+			welfare -= sum(restrictHours((v*m.db[k[0]]).dropna(), 'h', keep).sum() for k,v in m.blocks.parameters['c'].items() if 'h' in pyDbs.getDomains(v))
+			stored0 = m.db['stored_H'].xs(keep[-1], level = 'h').groupby('id').sum()
+		self.solveStats = {'status': max(s['status'] for s in stats), 'nit': sum(noneInit(s['nit'], 0) for s in stats), 'time': sum(s['time'] for s in stats), 'warm': False, 'windows': len(stats)}
+		if printSol:
+			print(f"Solution status {self.solveStats['status']}: solved {len(stats)} of {len(self.windows)} windows")
+		with self.log('postSolve'):
+			if self.solveStats['status'] == 0:
+				[self.db.__setitem__(k, pd.concat([sol[k] for sol in sols])) for k in sols[0]];
+				self.db['Welfare'] = welfare
+				self.reportSolution()
+
+	def windowSymbols(self, m):
+		return list(m.blocks.allvars)+(['λ_'+k for k in m.blocks.symbolTable.symbol] if self.computeDual else [])
 
 class mEmissionCap(mSimple):
 	def __init__(self, db, blocks = None, commonCap = True, **kwargs):
@@ -201,7 +290,7 @@ class mRES(mSimple):
 		super().__init__(db, blocks=blocks, **kwargs)
 		self.commonCap = commonCap
 
-	@property
+	@dbProperty
 	def cleanIds(self):
 		s = (self.db['FuelMix'] * self.db['EmissionIntensity']).groupby('id').sum()
 		return s[s <= 0].index
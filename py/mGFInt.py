@@ -65,38 +65,48 @@ class mSimple(modelShell):
 		db.updateAlias(alias=[('h','h_constr'),('id','id_constr')])
 		super().__init__(db, blocks=blocks, **kwargs)
 
-	@property
+	@dbProperty
 	def hourlyGeneratingCapacity(self):
 		return (adjMultiIndex.bc(self.db['GeneratingCapacity'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt')
 
-	@property
+	@dbProperty
 	def hourlyCapFactors(self):
 		return adjMultiIndex.bc(adj.rc_pd(self.db['CapVariation'], self.db['id2hvt']), self.db['id2hvt']).droplevel('hvt')
 
-	@property
+	@dbProperty
 	def hourlyLoad_c(self):
 		return self.db['LoadVariation'] * self.db['Load']
 
-	@property
+	@dbProperty
 	def hourlyLoad(self):
 		return pyDbs.pdSum(self.hourlyLoad_c, 'c')
 
+	@property
+	def investmentVariables(self):
+		""" GeneratingCapacity over id; linked to the hours only through ECapConstr. """
+		return ('GeneratingCapacity',)
+
 	def preSolve(self, recomputeMC=False, **kwargs):
 		if ('mc' not in self.db.symbols) or recomputeMC:
 			self.db['mc'] = mc(self.db)
 
-	@property
-	def globalDomains(self):
+	@dbProperty
+	def denseDomains(self):
 		return {'Generation': pd.MultiIndex.from_product([self.db['h'], self.db['id']]),
+				'ECapConstr': pd.MultiIndex.from_product([self.db['h_constr'], self.db['id_constr']])}
+
+	@dbProperty
+	def globalDomains(self):
+		return {'Generation': pruneDomain(self.denseDomains['Generation'], self.hourlyCapFactors) if self.sparseDomains else self.denseDomains['Generation'],
 				'GeneratingCapacity': self.db['id'],
 				'HourlyDemand': pyDbs.cartesianProductIndex([self.db['c'], self.db['h']]),
 				'equilibrium': self.db['h_constr'],
-				'ECapConstr': pd.MultiIndex.from_product([self.db['h_constr'], self.db['id_constr']]),
+				'ECapConstr': pruneDomain(self.denseDomains['ECapConstr'], adj.rc_pd(self.hourlyCapFactors, alias = {'h':'h_constr', 'id':'id_constr'})) if self.sparseDomains else self.denseDomains['ECapConstr'],
 				'TechCapConstr': self.db['TechCap'].index}
 
 	@property
 	def c(self):
-		return [{'varName': 'Generation', 'value': adjMultiIndex.bc(self.db['mc'], self.db['h'])},
+		return [{'varName': 'Generation', 'value': adjMultiIndex.bc(self.db['mc'], self.db['h']), 'conditions': self.sparseConditions('Generation')},
 				{'varName': 'HourlyDemand', 'value': -adjMultiIndex.bc(self.db['MWP'], self.globalDomains['HourlyDemand'])},
 				{'varName': 'GeneratingCapacity','value': adjMultiIndex.bc(self.db['InvestCost_A'], self.db['id2tech']).droplevel('tech').add(self.db['FOM'],fill_value=0)*1000*len(self.db['h'])/8760}]
 
@@ -121,7 +131,7 @@ class mSimple(modelShell):
 	@property
 	def A_ub(self):
 		return [{'constrName': 'ECapConstr', 'varName': 'Generation', 'value': appIndexWithCopySeries(pd.Series(1, index = self.globalDomains['Generation']), ['h','id'], ['h_constr','id_constr'])},
-				{'constrName': 'ECapConstr', 'varName': 'GeneratingCapacity', 'value': -appIndexWithCopySeries(adj.rc_pd(self.hourlyCapFactors, alias = {'h':'h_constr'}), 'id','id_constr')},
+				{'constrName': 'ECapConstr', 'varName': 'GeneratingCapacity', 'value': -appIndexWithCopySeries(adj.rc_pd(self.hourlyCapFactors, alias = {'h':'h_constr'}), 'id','id_constr'), 'conditions': self.sparseConditions('ECapConstr')},
 				{'constrName': 'TechCapConstr', 'varName': 'GeneratingCapacity', 'value': adjMultiIndex.applyMult(pd.Series(1, index = self.globalDomains['GeneratingCapacity']), self.db['id2tech'])}]
 
 	def initBlocks(self, **kwargs):
@@ -144,14 +154,14 @@ class mEmissionCap(mSimple):
 		return super().b_ub + [{'constrName': 'emissionsCap', 'value': self.db['CO2Cap']}]
 	@property
 	def A_ub(self):
-		return super().A_ub + [{'constrName': 'emissionsCap', 'varName': 'Generation', 'value': adjMultiIndex.bc(plantEmissionIntensity(self.db).xs('CO2',level='EmissionType'), self.db['h'])}]
+		return super().A_ub + [{'constrName': 'emissionsCap', 'varName': 'Generation', 'value': adjMultiIndex.bc(plantEmissionIntensity(self.db).xs('CO2',level='EmissionType'), self.db['h']), 'conditions': self.sparseConditions('Generation')}]
 
 
 class mRES(mSimple):
 	def __init__(self, db, blocks=None, **kwargs):
 		super().__init__(db, blocks=blocks, **kwargs)
 
-	@property
+	@dbProperty
 	def cleanIds(self):
 		s = (self.db['FuelMix'] * self.db['EmissionIntensity']).groupby('id').sum()
 		return s[s <= 0].index
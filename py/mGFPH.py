@@ -34,10 +34,12 @@ def marginalEconomicValue(m):
 									subsetIdsTech(-pyDbs.pdSum((m.db['λ_Generation_H'].xs('u',level='_type')  * m.hourlyCapFactors).dropna(), 'h').add( 1000 * m.db['FOM'] * len(m.db['h'])/8760, fill_value = 0).droplevel('g_H'),('Standard (H)','Heat pump'), m.db)
 									)
 
+@dbMemo
 def getTechs(techs, db):
 	""" Subset on tech types"""
 	return adj.rc_pd(db['id2modelTech2tech'].droplevel('tech'), pd.Index(techs if is_iterable(techs) else [techs], name = 'modelTech')).droplevel('modelTech')
 
+@dbMemo
 def getTechs_i(techs, db):
 	""" Subset on tech types"""
 	return adj.rc_pd(db['id2modelTech2tech'].droplevel('modelTech'), pd.Index(techs if is_iterable(techs) else [techs], name = 'tech')).droplevel('tech')
@@ -70,35 +72,40 @@ s		(4) intermittency in generation,
 	@property
 	def modelTech_H(self):
 		return ('Standard (H)','Backpressure','Heat pump')
-	@property
+	@dbProperty
 	def hourlyCapFactors(self):
 		return adjMultiIndex.bc(self.db['CapVariation'], self.db['id2hvt']).droplevel('hvt')
-	@property
+	@dbProperty
 	def hourlyGeneratingCap_E(self):
 		return subsetIdsTech( (adjMultiIndex.bc(self.db['GeneratingCap_E'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt'),
 								('Standard (E)','Backpressure'), self.db)
-	@property
+	@dbProperty
 	def hourlyGeneratingCap_H(self):
 		return subsetIdsTech( (adjMultiIndex.bc(self.db['GeneratingCap_H'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt'),
 								('Standard (H)','Heat pump'), self.db)
-	@property
+	@dbProperty
 	def hourlyLoad_cE(self):
 		return adjMultiIndex.bc(self.db['Load_E'] * self.db['LoadVariation_E'], self.db['c_E2g_E']).reorder_levels(['c_E','g_E','h'])
-	@property
+	@dbProperty
 	def hourlyLoad_cH(self):
 		return adjMultiIndex.bc(self.db['Load_H'] * self.db['LoadVariation_H'], self.db['c_H2g_H']).reorder_levels(['c_H','g_H','h'])
-	@property
+	@dbProperty
 	def hourlyLoad_E(self):
 		return pyDbs.pdSum(self.hourlyLoad_cE, 'c_E')
-	@property
+	@dbProperty
 	def hourlyLoad_H(self):
 		return pyDbs.pdSum(self.hourlyLoad_cH, 'c_H')
 
+	@property
+	def investmentVariables(self):
+		""" Electricity and heat capacities, GeneratingCap_E and GeneratingCap_H, linked to the hours through ECapConstr and HCapConstr. """
+		return ('GeneratingCap_E','GeneratingCap_H')
+
 	def preSolve(self, recomputeMC=False, **kwargs):
 			if ('mc' not in self.db.symbols) or recomputeMC:
 				self.db['mc'] = mc(self.db)
 
-	@property
+	@dbProperty
 	def globalDomains(self):
 		return {'Generation_E': pyDbs.cartesianProductIndex([subsetIdsTech(self.db['id2g_E'], self.modelTech_E, self.db), self.db['h']]),
 				'Generation_H': pyDbs.cartesianProductIndex([subsetIdsTech(self.db['id2g_H'], self.modelTech_H, self.db), self.db['h']]),
@@ -203,7 +210,7 @@ class mRES(mSimple):
 		super().__init__(db, blocks=blocks, **kwargs)
 		self.commonCap = commonCap
 
-	@property
+	@dbProperty
 	def cleanIds(self):
 		s = (self.db['FuelMix'] * self.db['EmissionIntensity']).groupby('id').sum()
 		return s[s <= 0].index
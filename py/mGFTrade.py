@@ -72,27 +72,32 @@ class mSimple(modelShell):
 		db['gConnected'] = db['lineCapacity'].index
 		super().__init__(db, blocks=blocks, **kwargs)
 
-	@property
+	@dbProperty
 	def hourlyGeneratingCapacity(self):
 		return (adjMultiIndex.bc(self.db['GeneratingCapacity'], self.db['id2hvt']) * self.db['CapVariation']).dropna().droplevel('hvt')
 
-	@property
+	@dbProperty
 	def hourlyCapFactors(self):
 		return adjMultiIndex.bc(adj.rc_pd(self.db['CapVariation'], self.db['id2hvt']), self.db['id2hvt']).droplevel('hvt')
 
-	@property
+	@dbProperty
 	def hourlyLoad_c(self):
 		return adjMultiIndex.bc(self.db['LoadVariation'] * self.db['Load'], self.db['c2g'])
 
-	@property
+	@dbProperty
 	def hourlyLoad(self):
 		return pyDbs.pdSum(self.hourlyLoad_c, 'c')
 
+	@property
+	def investmentVariables(self):
+		""" GeneratingCapacity over id; the hourly Transmission and Generation stay in the subproblems. """
+		return ('GeneratingCapacity',)
+
 	def preSolve(self, recomputeMC=False, **kwargs):
 		if ('mc' not in self.db.symbols) or recomputeMC:
 			self.db['mc'] = mc(self.db)
 
-	@property
+	@dbProperty
 	def globalDomains(self):
 		return {'Generation': pyDbs.cartesianProductIndex([self.db['id2g'], self.db['h']]),
 				'GeneratingCapacity': self.db['id'],
@@ -169,7 +174,7 @@ class mRES(mSimple):
 		super().__init__(db, blocks=blocks, **kwargs)
 		self.commonCap = commonCap
 
-	@property
+	@dbProperty
 	def cleanIds(self):
 		s = (self.db['FuelMix'] * self.db['EmissionIntensity']).groupby('id').sum()
 		return s[s <= 0].index
@@ -1,6 +1,6 @@
 from base import *
 from baseSparse import *
-from scipy.optimize import fsolve, minimize
+from scipy.optimize import fsolve, minimize, least_squares, NonlinearConstraint
 from scipy import sparse
 import numpy as np
 import warnings
@@ -8,12 +8,44 @@ import warnings
 class UserErrorMessage(UserWarning):
 	pass
 
+def safeguardedNewton(fun, lo, up, p0=None, tol=1e-8, n_iter=100, n_expand=50):
+	""" Vectorized Newton's method with bisection fallback for independent scalar problems f(p)=0, where each f is decreasing in p 
+		(as the excess demand in a market). fun(p,active) returns the function values and derivatives for the problems in the boolean
+		array active (other elements are ignored). The brackets [lo,up] are widened until f(lo)>=0>=f(up), and kept through the iterations;
+		Newton steps that leave the bracket are replaced by bisection. Converged problems are masked out of the following evaluations.
+		Returns the roots, a boolean array of converged problems, the number of iterations and the function values. """
+	lo, up, every = np.array(lo,dtype=float), np.array(up,dtype=float), np.ones(np.shape(lo),dtype=bool)
+	for i in range(n_expand):
+		f_lo, f_up = fun(lo,every)[0], fun(up,every)[0]
+		if ((f_lo>=0) & (f_up<=0)).all():
+			break
+		w = np.maximum(up-lo, 1)
+		lo, up = np.where(f_lo<0, lo-w, lo), np.where(f_up>0, up+w, up)
+	feasible = (f_lo>=0) & (f_up<=0)
+	p = (lo+up)/2 if p0 is None else np.clip(np.array(p0,dtype=float), lo, up)
+	f, d = fun(p,every)
+	iterations = np.zeros(p.shape, dtype=int)
+	active = feasible & ~np.isclose(f, 0, atol=tol)
+	for i in range(n_iter):
+		if not active.any():
+			break
+		h = active
+		lo[h], up[h] = np.where(f[h]>0, p[h], lo[h]), np.where(f[h]<0, p[h], up[h])
+		with np.errstate(divide='ignore', invalid='ignore'):
+			newton = p[h]-f[h]/d[h]
+		p[h] = np.where((newton>lo[h]) & (newton<up[h]), newton, (lo[h]+up[h])/2)
+		f_h, d_h = fun(p,h)
+		f[h], d[h] = f_h[h], d_h[h]
+		iterations[h] += 1
+		active = h & ~(np.isclose(f, 0, atol=tol) | (up-lo <= 4*np.finfo(float).eps*np.maximum(1, np.abs(p))))
+	return p, feasible & ~active, iterations, f
+
 class modelShellNL:
 	def __init__(self, db):
 		self.db = db
 
 	def unloadSolutionToDB(self,roots):
-		[self.db.__setitem__(i,pd.Series(roots[self.idx_endo[i]],index=self.db[i].index,name=i)) for i in self.idx_endo.keys() if i in self.endo_vars['x_vars']];
+		[self.db.__setitem__(k,self.xArray2pdSeries(roots,variable=k)) for k in self.idx_x if len(roots)>max(self.idx_x[k])];
 
 	def EquilibriumSolve(self,x0=None,solver='scipy',analyticalJacobian=False,n_iter=None,update_db=True):
 		""" Function for finding equilibrium prices using the excess demand function """
@@ -43,37 +75,59 @@ class modelShellNL:
 		""" Function for slowly approaching equilibrium using the sigmas as a globalization strategy """
 		for sigma in sigma_grid:
 			self.sigma = sigma
-			self.Solve(x0=x0,solver=solver,analyticalJacobian=analyticalJacobian,n_iter=n_iter,update_db=update_db)
+			self.EquilibriumSolve(x0=x0,solver=solver,analyticalJacobian=analyticalJacobian,n_iter=n_iter,update_db=update_db)
 			x0 = self.x.copy()
 
 	# def NestedEstimator(self,x,x0=None,fprime=None,weight_matrix=None):
 
 	# 	while self.
 
-	def Estimate(self,x,x0=None,method='MPEG',fprime=None,weight_matrix=None):
-		""" Function for estimating/calibrating model to data """
-		# Update xi:
-		# old_x = self.idx_x.copy()
-		# [self.idx_x.__setitem__(x,theta.xs('level'))
-		if weight_matrix is None:
-			weight_matrix = np.identity(len(data),dtype=float)
-		if method=='MPEG':
-			sol = minimize(
-				lambda x: self.EstimationObjective(x,weight_matrix), 
-				x0=x0,
-				constraints = {'type':'eq','fun':self.NonLinearSystem,'jac':self.dNonLinearSystem_dTheta},
-				jac = self.fprime
-			)
-		if method=='Nested':
+	def Estimate(self,x0=None,method='Nested',weight_matrix=None,update_db=True,**kwargs):
+		""" Function for estimating/calibrating model to data (self.Targets), starting from x0 (stacked according to idx_x):
+			- 'MPEC': Minimize the objective over x subject to the equilibrium conditions with trust-constr, using the analytical gradient, 
+			  the sparse Jacobian and Hessian of the equilibrium conditions and a Gauss-Newton approximation of the Hessian of the objective.
+			- 'Nested': Gauss-Newton (scipy.optimize.least_squares) over the parameters (x_vars['theta_var']), solving for the equilibrium in 
+			  each evaluation; the Jacobian of the residuals follows from the implicit function theorem.
+			kwargs are passed as options to the solver (as keyword arguments to least_squares with 'Nested'). """
+		self.set_estimation_structure()
+		x = np.array(x0,dtype=float)
+		if method in ('MPEC','MPEG'):
 			sol = minimize(
-				lambda x: self.EstimationObjective(),
-				x0 = x0,
-				jac = self.fprime
+				lambda x: self.EstimationObjective(x,weight_matrix),
+				x0=x,
+				jac=lambda x: self.dEstimationObjective_dx(x,weight_matrix),
+				hess=lambda x: self.EstimationObjective_GaussNewton(x,weight_matrix),
+				constraints=NonlinearConstraint(self.EstimationConstraint, 0, 0, jac=self.dEstimationConstraint_dx, hess=self.EstimationConstraint_hess),
+				method='trust-constr',
+				options=kwargs
 			)
-		if sol['succes']:
-			self.x = sol['x']
+			x = sol['x']
+		elif method=='Nested':
+			endo, theta = (np.hstack([np.asarray(self.idx_x[k]) for k in self.x_vars[t]]) for t in ('endo_var','theta_var'))
+			L = None if weight_matrix is None else np.linalg.cholesky(weight_matrix.toarray() if sparse.issparse(weight_matrix) else weight_matrix)
+			def solve(θ):
+				if not np.array_equal(x[theta], θ):
+					x[theta] = θ
+					x[:] = self.estimationEquilibrium(x)
+				return x
+			def residuals(θ):
+				r = self.estimationResiduals(solve(θ))
+				return r if L is None else L.T @ r
+			def jacobian(θ):
+				J, C = self.dEstimationResiduals_dx(solve(θ)).tocsc(), self.dEstimationConstraint_dx(x).tocsc()
+				dr = (J[:,theta]-J[:,endo] @ sparse.linalg.spsolve(C[:,endo], C[:,theta])).toarray()
+				return dr if L is None else L.T @ dr
+			x[:] = self.estimationEquilibrium(x)
+			sol = least_squares(residuals, x[theta], jac=jacobian, **kwargs)
+			solve(sol['x'])
+		else:
+			raise ValueError("method must be 'MPEC' or 'Nested'")
+		if sol['success']:
+			self.x = x
 			self.unloadSolutionToDB(self.x)
-			self.postSolve()
+			self.update_estimated_parameters()
+			if update_db:
+				self.postSolve()
 		else:
 			warnings.warn(r'Objective function was not minimized.', UserErrorMessage)
 		return sol['message']
@@ -0,0 +1,96 @@
+import copy
+import numpy as np, pandas as pd, pyDbs
+from pyDbs import noneInit
+from scipy.cluster.vq import kmeans2
+
+# Representative periods: The hourly profiles are split into consecutive periods (days by default) that are clustered with k-means.
+# Each cluster is represented by its medoid period (an actual period from the data, such that the chronology within periods is kept),
+# and each representative hour is weighted by the number of periods in its cluster. The model is then solved on the reduced set of
+# hours with lpBlock(weights = agg.lpWeights) (passed through the model's keyword arguments):
+#	agg = representativePeriods(db, 12)
+#	m = mGFInt.mSimple(agg.reduceDb(db), weights = agg.lpWeights)
+# Hourly costs are weighted relative to the mean weight, such that the annualization of fixed costs (len(db['h'])/8760) in the
+# models remains consistent; the objective is then the full-resolution objective scaled by len(hours)/len(h) (see agg.scale).
+# Constraints that couple consecutive hours (e.g. storage in mBasicPH_storage) are not consistent across representative periods.
+
+_profiles = ('CapVariation', 'LoadVariation', 'LoadVariation_E', 'LoadVariation_H', 'lineVariation')
+
+def representativePeriods(db, k, period = 24, symbols = None, seed = 0):
+	""" Cluster the periods of len 'period' hours in db['h'] into (at most) k representative periods, using the profiles in 'symbols'
+		(default: the hourly variation symbols in the db). """
+	h = pyDbs.getIndex(db['h'])
+	if len(h) % period:
+		raise ValueError(f"The number of hours ({len(h)}) is not divisible by period = {period}")
+	X = np.hstack([hourlyFeatures(db[s], h) for s in noneInit(symbols, [s for s in _profiles if s in db.symbols])])
+	n = len(h)//period
+	F = X.reshape(n, period*X.shape[1])
+	centroids, labels = kmeans2(F, min(k, n), minit = '++', seed = seed)
+	medoids = {c: (m := np.flatnonzero(labels == c))[np.argmin(((F[m]-centroids[c])**2).sum(axis=1))] for c in np.unique(labels)}
+	return timeAggregation(h, period, np.array([medoids[c] for c in labels]))
+
+def hourlyFeatures(s, h):
+	""" Profile s as an array with one row per hour in h and columns scaled to [0,1] """
+	x = (s.unstack([l for l in s.index.names if l != 'h']) if isinstance(s.index, pd.MultiIndex) else s.to_frame()).reindex(h).fillna(0).values.astype(float)
+	rng = x.max(axis=0)-x.min(axis=0)
+	return (x-x.min(axis=0))/np.where(rng > 0, rng, 1)
+
+class timeAggregation:
+	def __init__(self, h, period, representative):
+		""" representative[i] is the position of the period that represents period i of the hours in h """
+		self.h, self.period = h, period
+		reps, counts = np.unique(representative, return_counts = True)
+		pos = np.arange(len(h))
+		self.map = pd.Series(h[representative.repeat(period)*period+pos % period], index = h)
+		self.weights = pd.Series(counts.repeat(period).astype(float), index = h[(reps[:,None]*period+np.arange(period)).ravel()])
+
+	@property
+	def hours(self):
+		return self.weights.index
+
+	@property
+	def scale(self):
+		""" Ratio of the full-resolution objective to the objective of the reduced model """
+		return len(self.h)/len(self.hours)
+
+	@property
+	def lpWeights(self):
+		return {'h': self.weights}
+
+	def reduceDb(self, db):
+		""" Copy of db with all symbols defined over 'h' restricted to the representative hours """
+		db = copy.deepcopy(db)
+		[db.__setitem__(k, restrictHours(v, self.hours)) for k,v in db.symbols.items() if isinstance(v, (pd.Series, pd.Index)) and 'h' in pyDbs.getIndex(v).names];
+		return db
+
+	def hourLevel(self, s):
+		return next((l for l in ('h','h_constr') if l in pyDbs.getDomains(s)), None)
+
+	def expand(self, s, dual = False):
+		""" Map s from the representative hours to all hours. Duals are rescaled to the units of the full-resolution model (hourly
+			duals are divided by the objective weight of the hour, the remaining duals by 1/scale). """
+		level = self.hourLevel(s)
+		if level is None:
+			return s*self.scale if dual else s
+		if dual:
+			s = s / (self.weights/self.weights.mean()).reindex(s.index.get_level_values(level)).values
+		x = s.index.to_frame(index = False).assign(_v = s.values).merge(pd.DataFrame({level: self.map.values, '_full': self.map.index.values}), on = level)
+		x[level] = x.pop('_full')
+		v = x.pop('_v')
+		return pd.Series(v.values, index = pd.MultiIndex.from_frame(x) if x.shape[1] > 1 else pd.Index(x[level], name = level), name = s.name)
+
+def restrictHours(v, hours):
+	return v[pyDbs.getIndex(v).get_level_values('h').isin(hours)]
+
+def approximationError(full, reduced, agg, symbols, objectiveSymbols = ('Welfare','SystemCosts')):
+	""" Compare solutions in the db 'full' (solved on all hours) with the db 'reduced' (solved on agg.hours). Hourly symbols are
+		expanded to all hours, symbols starting with 'λ_' are treated as duals, and objectiveSymbols are rescaled by agg.scale.
+		Returns a dataframe with the total of each symbol, the relative error of the total, and the root mean squared error of
+		the elements relative to the mean absolute value in the full solution. """
+	def compare(k):
+		x = pyDbs.getIndex(full[k]) is not None
+		y = agg.expand(reduced[k], dual = k.startswith('λ_')) if x else reduced[k]*(agg.scale if k in objectiveSymbols else 1)
+		f, a = (full[k], y.reindex(full[k].index).fillna(0)) if x else (full[k], y)
+		tf, ta = float(np.sum(f)), float(np.sum(a))
+		return {'full': tf, 'approx': ta, 'relError': abs(ta-tf)/abs(tf) if tf else np.nan,
+				'nrmse': float(np.sqrt(np.mean((np.asarray(a)-np.asarray(f))**2))/np.mean(np.abs(f))) if np.any(f) else np.nan}
+	return pd.DataFrame({k: compare(k) for k in symbols}).T